@@ -0,0 +1,78 @@
+"""
+Per-test overhead of the ``environ`` fixture, across environment sizes.
+
+Compares the old snapshot-and-rebind approach against `EnvironRecorder` (what
+the fixture now uses), `EnvironSnapshot` (its fallback) and `EnvironTracker`
+(as used by the wider scoped variants), for a test that changes a single key.
+Run as ``python benchmarks/environ.py``.
+"""
+
+import os
+from timeit import repeat
+
+from pytest_relaxed.fixtures import (
+    EnvironRecorder,
+    EnvironSnapshot,
+    EnvironTracker,
+)
+
+SIZES = (100, 1000, 10000)
+NUMBER = 200
+KEY = "PYTEST_RELAXED_BENCH"
+
+
+def rebind():
+    # What the fixture used to do: copy everything, then rebind to the copy
+    # (the rebinding itself being free, but leaving the change in place.)
+    current = os.environ.copy()
+    os.environ[KEY] = "x"
+    del os.environ[KEY]
+    return current
+
+
+def recorded():
+    recorder = EnvironRecorder()
+    recorder.start()
+    os.environ[KEY] = "x"
+    recorder.restore()
+
+
+def diffed():
+    snapshot = EnvironSnapshot()
+    os.environ[KEY] = "x"
+    snapshot.restore()
+
+
+def tracked():
+    tracker = EnvironTracker()
+    tracker[KEY] = "x"
+    tracker.restore()
+
+
+def main():
+    # NOTE: the real os.environ is used (padded out to each size, then put
+    # back), as its per-key decoding & putenv calls are part of the cost.
+    funcs = (rebind, recorded, diffed, tracked)
+    template = "{:>8}" + "  {:>14}" * len(funcs)
+    print(
+        template.format("keys", *("{} (us)".format(x.__name__) for x in funcs))
+    )
+    padding = []
+    try:
+        for size in SIZES:
+            while len(os.environ) < size:
+                key = "PYTEST_RELAXED_PAD_{}".format(len(padding))
+                os.environ[key] = "x" * 32
+                padding.append(key)
+            results = []
+            for func in funcs:
+                best = min(repeat(func, number=NUMBER, repeat=5))
+                results.append("{:.2f}".format(best / NUMBER * 1e6))
+            print(template.format(len(os.environ), *results))
+    finally:
+        for key in padding:
+            del os.environ[key]
+
+
+if __name__ == "__main__":
+    main()
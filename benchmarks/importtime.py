@@ -0,0 +1,59 @@
+"""
+Import time of pytest-relaxed's plugin module, via ``python -X importtime``.
+
+Reports the cumulative time of each of our modules (and of anything else they
+pulled in beyond what pytest itself needs), best of several fresh interpreters.
+Run as ``python benchmarks/importtime.py [runs]``.
+"""
+
+import subprocess
+import sys
+
+RUNS = 10
+
+
+def importtime():
+    """
+    Return ``{module: cumulative microseconds}`` for one fresh interpreter.
+    """
+    # NOTE: importing pytest first keeps its own imports out of the picture.
+    code = "import pytest; import pytest_relaxed.plugin"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    times = {}
+    seen_pytest = False
+    for line in proc.stderr.decode().splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if not seen_pytest:
+            # Everything up to & including pytest itself is pytest's cost.
+            seen_pytest = name == "pytest"
+            continue
+        try:
+            times[name] = int(cumulative)
+        except ValueError:  # The header line
+            continue
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    best = {}
+    for _ in range(runs):
+        for name, micros in importtime().items():
+            best[name] = min(micros, best.get(name, micros))
+    template = "{:>10}  {}"
+    print(
+        template.format("usec", "module (cumulative, best of {})".format(runs))
+    )
+    for name, micros in sorted(best.items(), key=lambda x: -x[1]):
+        print(template.format(micros, name))
+
+
+if __name__ == "__main__":
+    main()
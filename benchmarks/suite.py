@@ -0,0 +1,247 @@
+"""
+Benchmark suite for relaxed's hot paths, versus stock pytest.
+
+Generates synthetic spec trees (see `generate`) and times:
+
+- collection (``--collect-only``) of a relaxed-style tree, versus an
+  equivalent ``test_``-prefixed tree collected by pytest with relaxed disabled;
+- a verbose run of both trees (i.e. our reporter versus pytest's own);
+- ``trap`` throughput in each of its modes, versus writing to a plain
+  `io.StringIO`.
+
+Results are written as JSON to ``benchmarks/results/<version>.json`` (the
+installed pytest-relaxed's version, by default), so later runs can be compared
+against them via ``--compare``. Run ``python benchmarks/suite.py --help`` for
+all options.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+
+import pytest
+
+from pytest_relaxed import trap
+from pytest_relaxed._version import __version__
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, "results")
+
+
+def generate(root, modules, width, depth, classic=False):
+    """
+    Write ``modules`` spec modules under ``root``.
+
+    Each module holds ``width`` top level classes, each of which holds
+    ``width`` test methods and ``width`` nested classes, and so on down to
+    ``depth`` levels of classes. With ``classic=True``, names get pytest's
+    stock ``test_``/``Test`` prefixes so vanilla pytest collects the same tree.
+    """
+    test_prefix, class_prefix = ("test_", "Test") if classic else ("", "")
+
+    def klass(lines, indent, level):
+        for i in range(width):
+            pad = "    " * indent
+            lines.append(
+                "{}class {}Level{}_{}:".format(pad, class_prefix, level, i)
+            )
+            for j in range(width):
+                lines.append(
+                    "{}    def {}behaves_{}(self):".format(pad, test_prefix, j)
+                )
+                lines.append("{}        pass".format(pad))
+            if level < depth:
+                klass(lines, indent + 1, level + 1)
+
+    for number in range(modules):
+        lines = []
+        klass(lines, 0, 1)
+        name = "{}spec_{}.py".format(test_prefix, number)
+        with open(os.path.join(root, name), "w") as fd:
+            fd.write("\n".join(lines) + "\n")
+
+
+def count_tests(modules, width, depth):
+    # Each level multiplies the number of classes by width.
+    return modules * sum(width ** (level + 1) for level in range(1, depth + 1))
+
+
+def run_pytest(root, *args):
+    """
+    Run pytest in a subprocess under ``root``, returning its wall time.
+    """
+    cmd = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider"]
+    start = perf_counter()
+    subprocess.run(
+        cmd + list(args),
+        cwd=root,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=False,
+    )
+    return perf_counter() - start
+
+
+def best_of(repeat, func, *args):
+    return min(func(*args) for _ in range(repeat))
+
+
+def bench_pytest(options):
+    with tempfile.TemporaryDirectory() as spec:
+        classic = os.path.join(spec, "classic")
+        spec = os.path.join(spec, "spec")
+        os.mkdir(classic)
+        os.mkdir(spec)
+        shape = (options.modules, options.width, options.depth)
+        generate(spec, *shape)
+        generate(classic, *shape, classic=True)
+        relaxed_args = ("-p", "relaxed")
+        stock_args = ("-p", "no:relaxed")
+        return {
+            "tests": count_tests(*shape),
+            "collection": {
+                "relaxed": best_of(
+                    options.repeat,
+                    run_pytest,
+                    spec,
+                    "--collect-only",
+                    *relaxed_args
+                ),
+                "stock": best_of(
+                    options.repeat,
+                    run_pytest,
+                    classic,
+                    "--collect-only",
+                    *stock_args
+                ),
+            },
+            "verbose_run": {
+                "relaxed": best_of(
+                    options.repeat, run_pytest, spec, "-v", *relaxed_args
+                ),
+                "stock": best_of(
+                    options.repeat, run_pytest, classic, "-v", *stock_args
+                ),
+            },
+        }
+
+
+def bench_trap(options):
+    line = "x" * 79 + "\n"
+    lines = options.lines
+
+    def stock():
+        stream = io.StringIO()
+        start = perf_counter()
+        for _ in range(lines):
+            stream.write(line)
+        stream.getvalue()
+        return perf_counter() - start
+
+    def trapped(**kwargs):
+        @trap(**kwargs)
+        def run():
+            start = perf_counter()
+            for _ in range(lines):
+                sys.stdout.write(line)
+            sys.stdout.getvalue()
+            return perf_counter() - start
+
+        return run()
+
+    return {
+        "lines": lines,
+        "stock": best_of(options.repeat, stock),
+        "default": best_of(options.repeat, trapped),
+        "chunked": best_of(options.repeat, lambda: trapped(chunked=True)),
+        "local": best_of(options.repeat, lambda: trapped(local=True)),
+    }
+
+
+def flatten(results, prefix=""):
+    # {"a": {"b": 1}} -> {"a.b": 1}, for display & comparison.
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "."))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+def report(results, baseline=None):
+    flat = flatten(results["timings"])
+    old = flatten(baseline["timings"]) if baseline else {}
+    template = "{:<28} {:>12} {:>12} {:>8}"
+    print(template.format("benchmark", "this run", "baseline", "ratio"))
+    for key, value in sorted(flat.items()):
+        if key.endswith(("tests", "lines")):
+            continue
+        before = old.get(key)
+        print(
+            template.format(
+                key,
+                "{:.4f}".format(value),
+                "-" if before is None else "{:.4f}".format(before),
+                "-" if not before else "{:.2f}x".format(value / before),
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--width", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--name",
+        default=__version__,
+        help="Name to store results under (default: installed version).",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="NAME",
+        help="Name of earlier results to compare against.",
+    )
+    parser.add_argument(
+        "--no-save", action="store_true", help="Don't write results out."
+    )
+    options = parser.parse_args(argv)
+
+    results = {
+        "name": options.name,
+        "python": platform.python_version(),
+        "pytest": pytest.__version__,
+        "shape": {
+            "modules": options.modules,
+            "width": options.width,
+            "depth": options.depth,
+        },
+        "timings": {
+            "pytest": bench_pytest(options),
+            "trap": bench_trap(options),
+        },
+    }
+    baseline = None
+    if options.compare:
+        with open(os.path.join(RESULTS, options.compare + ".json")) as fd:
+            baseline = json.load(fd)
+    report(results, baseline)
+    if not options.no_save:
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, options.name + ".json")
+        with open(path, "w") as fd:
+            json.dump(results, fd, indent=2)
+        print("Results written to {}".format(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Cost of ``pytest_report_teststatus`` fan-out in a verbose run.
+
+Runs a generated module of ``TESTS`` tests (a third of them failing, and with
+``-rA`` so the summary asks about every report again; tracebacks are turned
+off as they'd dwarf everything else) alongside ``PLUGINS``
+dummy plugins implementing the hook. Reports how often those plugins got
+asked, and the run's wall time, with our reporter versus pytest's own.
+
+Run as ``python benchmarks/teststatus.py``.
+"""
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import pytest
+
+TESTS = 2000
+PLUGINS = 20
+
+
+class Dummy:
+    calls = 0
+
+    def pytest_report_teststatus(self, report):
+        Dummy.calls += 1
+
+
+def run(root, reporter):
+    Dummy.calls = 0
+    plugins = [Dummy() for _ in range(PLUGINS)]
+    args = [root, "-v", "-rA", "--tb=no", "-p", "no:cacheprovider"]
+    args.append("--relaxed-reporter={}".format(reporter))
+    # NOTE: our own output isn't what's being measured.
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+    start = perf_counter()
+    try:
+        pytest.main(args, plugins=plugins)
+    finally:
+        elapsed = perf_counter() - start
+        sys.stdout = stdout
+        devnull.close()
+    # Each dummy is asked the same number of times.
+    return Dummy.calls / PLUGINS, elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        lines = ["class Behaviors:"]
+        for i in range(TESTS):
+            lines.append("    def behavior_{}(self):".format(i))
+            lines.append("        assert {}".format(i % 3))
+        with open(os.path.join(root, "behaviors.py"), "w") as fd:
+            fd.write("\n".join(lines) + "\n")
+        template = "{:<10} {:>16} {:>10}"
+        print(template.format("reporter", "asks per test", "seconds"))
+        for reporter in ("off", "on"):
+            calls, elapsed = run(root, reporter)
+            print(
+                template.format(
+                    reporter,
+                    "{:.2f}".format(calls / TESTS),
+                    "{:.3f}".format(elapsed),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Output throughput under each of ``trap``'s capture modes.
+
+Run as ``python benchmarks/trap.py``.
+"""
+
+import os
+import sys
+from time import perf_counter
+
+from pytest_relaxed import trap
+
+LINES = 200000
+LINE = "x" * 79 + "\n"
+MODES = {
+    "default": {},
+    "chunked": {"chunked": True},
+    "fd": {"fd": True},
+}
+
+
+def python_writes():
+    for _ in range(LINES):
+        sys.stdout.write(LINE)
+
+
+def fd_writes():
+    data = LINE.encode("utf-8")
+    for _ in range(LINES):
+        os.write(1, data)
+
+
+def measure(mode, func):
+    @trap(**MODES[mode])
+    def run():
+        start = perf_counter()
+        func()
+        # Include the cost of actually getting at the output.
+        sys.stdout.getvalue()
+        return perf_counter() - start
+
+    return run()
+
+
+def main():
+    megabytes = LINES * len(LINE) / 1024 / 1024
+    template = "{:<10} {:<16} {:>10}"
+    print(template.format("mode", "writes via", "MB/s"))
+    for mode in MODES:
+        for func in (python_writes, fd_writes):
+            # Only fd mode can see descriptor level writes.
+            if func is fd_writes and mode != "fd":
+                continue
+            elapsed = measure(mode, func)
+            print(
+                template.format(
+                    mode,
+                    func.__name__.split("_")[0],
+                    "{:.1f}".format(megabytes / elapsed),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Optional capture machinery behind `.trap.trap`'s options.
+
+Only imported when a trap asks for chunked, file descriptor level, per-thread
+or per-task capture, so merely loading pytest-relaxed doesn't pay for it.
+"""
+
+import codecs
+import io
+import os
+import re
+import selectors
+import sys
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+from time import monotonic
+
+from .trap import StreamingLines
+
+
+class LineWatcher:
+    """
+    Incrementally splits written data into lines, for streaming assertions.
+
+    Only a running count, any trailing partial line, and the most recent
+    ``history`` complete lines are kept; the full output is never rebuilt.
+    Safe to feed from one thread while another waits on it.
+
+    Streams only create (and start feeding) their watcher once the streaming
+    API is first used, `seed`-ing it with what was written up to then.
+    """
+
+    def __init__(self, history=1000):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial = []
+        self.count = 0
+        self.history = deque(maxlen=history)
+        self.callbacks = []
+        self.closed = False
+        self.condition = threading.Condition(threading.Lock())
+        # Number of threads blocked in lines()/wait_for(), so writes needn't
+        # bother notifying when nobody's listening.
+        self.waiting = 0
+
+    def seed(self, text):
+        """
+        Account for ``text`` written before we started watching.
+
+        Callbacks aren't called for these lines, as none can be registered yet.
+        """
+        with self.condition:
+            lines = text.split("\n")
+            tail = lines.pop()
+            self.partial = [tail] if tail else []
+            self._record(lines)
+
+    def feed(self, data):
+        # NOTE: this is called for every single write, so it's kept lean.
+        if not isinstance(data, str):
+            data = self.decoder.decode(data)
+        with self.condition:
+            if "\n" not in data:
+                if data:
+                    self.partial.append(data)
+                return
+            self.partial.append(data)
+            lines = "".join(self.partial).split("\n")
+            tail = lines.pop()
+            self.partial = [tail] if tail else []
+            self._record(lines)
+            callbacks = self.callbacks[:] if self.callbacks else None
+        if callbacks:
+            self._call(callbacks, lines)
+
+    def _record(self, lines):
+        self.history.extend(lines)
+        self.count += len(lines)
+        if self.waiting:
+            self.condition.notify_all()
+
+    def _call(self, callbacks, lines):
+        for line in lines:
+            for callback in callbacks:
+                callback(line)
+
+    def _wait(self, timeout):
+        self.waiting += 1
+        try:
+            return self.condition.wait(timeout)
+        finally:
+            self.waiting -= 1
+
+    def close(self):
+        """
+        Mark the stream finished, publishing any trailing partial line.
+        """
+        with self.condition:
+            tail = "".join(self.partial) + self.decoder.decode(b"", final=True)
+            self.partial = []
+            lines = [tail] if tail else []
+            self._record(lines)
+            self.closed = True
+            self.condition.notify_all()
+            callbacks = self.callbacks[:]
+        self._call(callbacks, lines)
+
+    def lines(self, timeout=None):
+        """
+        Yield complete lines, oldest retained line first, as they arrive.
+
+        Waits up to ``timeout`` seconds (forever, if ``None``) for each next
+        line; iteration ends once that elapses or the stream is closed. Lines
+        which fall out of the history before being yielded are skipped.
+        """
+        with self.condition:
+            cursor = self.count - len(self.history)
+        while True:
+            with self.condition:
+                if cursor >= self.count and not self.closed:
+                    self._wait(timeout)
+                if cursor >= self.count:
+                    return
+                oldest = self.count - len(self.history)
+                cursor = max(cursor, oldest)
+                line = self.history[cursor - oldest]
+            cursor += 1
+            yield line
+
+    def wait_for(self, pattern, timeout=None):
+        """
+        Return the regex match for the first line matching ``pattern``.
+
+        Raises `AssertionError` if no such line shows up within ``timeout``
+        seconds (in total), or before the stream is closed.
+        """
+        regex = re.compile(pattern)
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.condition:
+            cursor = self.count - len(self.history)
+            while True:
+                oldest = self.count - len(self.history)
+                start = max(cursor, oldest) - oldest
+                for line in islice(self.history, start, None):
+                    match = regex.search(line)
+                    if match:
+                        return match
+                cursor = self.count
+                if self.closed:
+                    break
+                if deadline is None:
+                    self._wait(None)
+                else:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wait(remaining)
+        raise AssertionError(
+            "Never saw a line matching {!r}".format(regex.pattern)
+        )
+
+
+class CaptureLog:
+    """
+    Single, interleaved record of writes to several streams.
+
+    Each write is kept as-is (no copying or encoding) alongside a tag naming
+    the stream it went to; per-stream values are only assembled when asked for
+    via `value`. Memory use may be bounded in one of two ways:
+
+    - ``max_bytes``: keep only (roughly) the most recent ``max_bytes`` worth of
+      writes, dropping the oldest whole writes as needed, ring buffer style.
+      The total size of dropped writes is kept in ``dropped``.
+    - ``spill_bytes``: once more than ``spill_bytes`` are held in memory, move
+      them to an anonymous temporary file, so nothing is lost.
+
+    Sizes are measured in characters for `str` writes and bytes otherwise.
+    """
+
+    def __init__(self, max_bytes=None, spill_bytes=None):
+        if max_bytes is not None and spill_bytes is not None:
+            raise ValueError("Can't give both max_bytes and spill_bytes!")
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        # In-memory (tag, data) chunks, oldest first.
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+        # Spilled chunks live in a tempfile, indexed by (tag, offset, length)
+        # runs (adjacent runs from the same stream being merged.)
+        self.spill = None
+        self.spilled = []
+        # tag -> LineWatchers to feed writes with that tag to
+        self.watchers = {}
+        self.lock = threading.RLock()
+
+    def watch(self, tags, watcher):
+        """
+        Seed ``watcher`` with writes tagged with any of ``tags`` so far, then
+        feed it all such writes from now on.
+        """
+        with self.lock:
+            watcher.seed(self.value(tags))
+            for tag in tags:
+                self.watchers.setdefault(tag, []).append(watcher)
+
+    def write(self, tag, data):
+        if not data:
+            return
+        with self.lock:
+            if self.watchers:
+                for watcher in self.watchers.get(tag, ()):
+                    watcher.feed(data)
+            self.chunks.append((tag, data))
+            self.size += len(data)
+            if self.max_bytes is not None:
+                while self.size > self.max_bytes:
+                    dropped = self.chunks.popleft()[1]
+                    self.size -= len(dropped)
+                    self.dropped += len(dropped)
+            elif self.spill_bytes is not None and self.size > self.spill_bytes:
+                self._spill()
+
+    def _spill(self):
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile()
+        offset = self.spill.seek(0, io.SEEK_END)
+        while self.chunks:
+            tag, data = self.chunks.popleft()
+            data = _as_bytes(data)
+            self.spill.write(data)
+            if self.spilled and self.spilled[-1][0] == tag:
+                prev_tag, prev_offset, prev_length = self.spilled[-1]
+                self.spilled[-1] = (tag, prev_offset, prev_length + len(data))
+            else:
+                self.spilled.append((tag, offset, len(data)))
+            offset += len(data)
+        self.size = 0
+
+    def value(self, tags=None):
+        """
+        Return everything written with any of ``tags`` (or all tags), as text.
+        """
+        parts = []
+        with self.lock:
+            for tag, offset, length in self.spilled:
+                if tags is None or tag in tags:
+                    self.spill.seek(offset)
+                    parts.append(self.spill.read(length))
+            for tag, data in self.chunks:
+                if tags is None or tag in tags:
+                    parts.append(_as_bytes(data))
+        return b"".join(parts).decode("utf-8")
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+            self.spilled = []
+        self.chunks.clear()
+        self.size = 0
+
+
+def _as_bytes(data):
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return data
+
+
+class CaptureStream(StreamingLines, io.IOBase):
+    """
+    Writable stream recording into a `CaptureLog` under a given tag.
+
+    Offers the same "write str or bytes, ``getvalue`` a str" API as
+    `.trap.CarbonCopy`. Its value is that of all writes tagged with ``view``,
+    which defaults to just its own ``tag``.
+    """
+
+    encoding = "utf-8"
+
+    def __init__(self, log, tag, view=None, fd_capture=None):
+        super().__init__()
+        self.log = log
+        self.tag = tag
+        self.view = (tag,) if view is None else view
+        # When also capturing at the file descriptor level, anything already
+        # written to the descriptors is pulled in before our own writes, so the
+        # two are recorded in order.
+        self.fd_capture = fd_capture
+
+    def writable(self):
+        return True
+
+    def _start_watching(self):
+        with self.log.lock:
+            if self._watcher is None:
+                watcher = LineWatcher()
+                self.log.watch(self.view, watcher)
+                self._watcher = watcher
+
+    def write(self, s):
+        if self.fd_capture is None:
+            self.log.write(self.tag, s)
+        else:
+            with self.fd_capture.lock:
+                self.fd_capture.drain()
+                self.log.write(self.tag, s)
+        return len(s)
+
+    # Real sys.std(out|err) requires writing to a buffer attribute obj in some
+    # situations.
+    @property
+    def buffer(self):
+        return self
+
+    def getvalue(self):
+        if self.fd_capture is None:
+            return self.log.value(self.view)
+        with self.fd_capture.lock:
+            self.fd_capture.drain()
+            return self.log.value(self.view)
+
+
+class FDCapture:
+    """
+    Redirects file descriptors into pipes, recording their output in a log.
+
+    ``fds`` maps descriptor numbers to `CaptureLog` tags. A background thread
+    keeps the pipes drained (so writers never block on a full pipe); `drain`
+    may also be called (with ``lock`` held) to synchronously pull in anything
+    written so far, e.g. before reading the log.
+
+    .. note::
+        Output written to different descriptors between two drains is recorded
+        one descriptor at a time, so its exact interleaving is lost. Output
+        held in a C library's own buffers (e.g. unflushed ``printf`` calls)
+        only shows up once flushed.
+
+    POSIX only.
+    """
+
+    def __init__(self, log, fds):
+        self.log = log
+        self.fds = fds
+        self.lock = threading.Lock()
+        self.selector = None
+        self.thread = None
+        self.stopping = False
+        # fd -> (saved duplicate of the original, pipe read end)
+        self.redirects = {}
+
+    def start(self):
+        self.selector = selectors.DefaultSelector()
+        for fd, tag in self.fds.items():
+            read_end, write_end = os.pipe()
+            os.set_blocking(read_end, False)
+            saved = os.dup(fd)
+            os.dup2(write_end, fd)
+            os.close(write_end)
+            self.redirects[fd] = (saved, read_end)
+            self.selector.register(read_end, selectors.EVENT_READ, tag)
+        self.thread = threading.Thread(
+            target=self._run, name="relaxed-fd-capture", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopping:
+            events = self.selector.select(timeout=0.1)
+            if events:
+                with self.lock:
+                    for key, _ in events:
+                        self._read(key.fd, key.data)
+
+    def _read(self, fd, tag):
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except BlockingIOError:
+                return
+            # EOF; all writers are gone.
+            if not data:
+                return
+            self.log.write(tag, data)
+
+    def drain(self):
+        """
+        Record everything written so far. Must be called with ``lock`` held.
+        """
+        for fd, (_, read_end) in self.redirects.items():
+            self._read(read_end, self.fds[fd])
+
+    def stop(self):
+        self.stopping = True
+        # Restoring the descriptors closes our pipes' last write ends (barring
+        # any lingering subprocesses), waking up the reader thread.
+        for fd, (saved, _) in self.redirects.items():
+            os.dup2(saved, fd)
+            os.close(saved)
+        self.thread.join()
+        with self.lock:
+            self.drain()
+        for _, read_end in self.redirects.values():
+            self.selector.unregister(read_end)
+            os.close(read_end)
+        self.selector.close()
+        self.redirects = {}
+
+
+_current = ContextVar("relaxed_trap_capture", default=None)
+
+
+class ContextProxy:
+    """
+    Stand-in for a ``sys`` stream, dispatching to the current context's trap.
+
+    Where no `.trap.Capture` is active in the current context (see
+    `local_capture`), dispatches to ``fallback`` (typically the stream it
+    replaced) instead.
+    """
+
+    def __init__(self, name, fallback):
+        self._name = name
+        self._fallback = fallback
+
+    def _target(self):
+        capture = _current.get()
+        if capture is None:
+            if self._fallback is None:
+                raise AttributeError(
+                    "sys.{} is only available while trapped".format(self._name)
+                )
+            return self._fallback
+        return getattr(capture, self._name)
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+
+class _ProxyInstaller:
+    """
+    Installs `ContextProxy` objects as ``sys.std(out|err|all)`` while needed.
+
+    Reference counted, so overlapping users (e.g. concurrent tasks) share one
+    set of proxies, installed by the first and removed by the last.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        self.saved = None
+
+    def acquire(self):
+        with self.lock:
+            self.users += 1
+            if self.users == 1:
+                self.saved = (sys.stdout, sys.stderr)
+                sys.stdout = ContextProxy("stdout", sys.stdout)
+                sys.stderr = ContextProxy("stderr", sys.stderr)
+                sys.stdall = ContextProxy("stdall", None)
+
+    def release(self):
+        with self.lock:
+            self.users -= 1
+            if self.users == 0:
+                sys.stdout, sys.stderr = self.saved
+                self.saved = None
+                del sys.stdall
+
+
+_proxies = _ProxyInstaller()
+
+
+@contextmanager
+def local_capture(capture):
+    """
+    Make ``capture`` the target of ``sys.std(out|err|all)`` in this context.
+
+    Other contexts (e.g. other threads, or other asyncio tasks) are
+    unaffected, and the proxies' dispatching itself takes no locks.
+    """
+    _proxies.acquire()
+    token = _current.set(capture)
+    try:
+        yield capture
+    finally:
+        _current.reset(token)
+        _proxies.release()
@@ -2,12 +2,15 @@ import inspect
 import logging
 import types
 
-from pytest import Class, Module
+from pytest import Class, Module, StashKey
 
 # NOTE: don't see any other way to get access to pytest innards besides using
 # the underscored name :(
 from _pytest.python import PyCollector
 
+from .profiling import profiled
+from .timings import ordering_key
+
 
 log = logging.getLogger("relaxed")
 
@@ -32,6 +35,203 @@ def istestfunction(obj, name):
     return not (is_hidden_name or is_fixture)
 
 
+def inheritance_plan(parent_obj, obj):
+    """
+    Determine which attributes nested class ``obj`` inherits from its parent.
+
+    Returns a tuple of attribute names to copy from ``parent_obj`` to ``obj``.
+    See also `cached_inheritance_plan`.
+    """
+    plan = []
+    # Obtain parent attributes, etc not found on our obj (serves as both a
+    # useful identifier of "stuff added to an outer class" and a way of
+    # ensuring that we can override such attrs)
+    delta = set(dir(parent_obj)).difference(dir(obj))
+    # NOTE: sorted for determinism, versus set iteration order.
+    for name in sorted(delta):
+        # Pytest's pytestmark attributes always get skipped, we don't want
+        # to spread that around where it's not wanted. (Besides, it can
+        # cause a lot of collection level warnings.)
+        if name == "pytestmark":
+            continue
+        value = getattr(parent_obj, name)
+        # Classes get skipped; they'd always just be other 'inner' classes
+        # that we don't want to copy elsewhere.
+        if isinstance(value, type):
+            continue
+        # Functions (methods) may get skipped, or not, depending:
+        # NOTE: as of pytest 7, for some reason the value appears as a
+        # function and not a method (???) so covering both bases...
+        if isinstance(value, (types.MethodType, types.FunctionType)):
+            # If they look like tests, they get skipped; don't want to copy
+            # tests around!
+            if istestfunction(obj, name):
+                continue
+            # Non-test == they're probably lifecycle methods
+            # (setup/teardown) or helpers (_do_thing). Rebind them to the
+            # target instance, otherwise the 'self' in the setup/helper is
+            # not the same 'self' as that in the actual test method it runs
+            # around or within! (Which happens when the plan is applied.)
+        # Anything else should be some data-type attribute, which is copied
+        # verbatim / by-value.
+        plan.append(name)
+    return tuple(plan)
+
+
+inheritance_plans_key = StashKey[dict]()
+
+
+def cached_inheritance_plan(config, parent_obj, obj):
+    """
+    Return `inheritance_plan` for the given classes, computing it only once.
+
+    Nested classes are re-decorated every time they're collected (and the
+    parent objs are themselves the products of this same process), and we
+    don't want to keep redoing big dir() set operations for deep trees. This
+    also ensures the plan is computed against the child's original,
+    not-yet-decorated attributes.
+
+    NOTE: plans are cached per session (so classes aren't kept alive past it)
+    and only hold attribute names, whose values are looked up anew each time
+    a plan is applied.
+    """
+    plans = config.stash.setdefault(inheritance_plans_key, {})
+    key = (parent_obj, obj)
+    plan = plans.get(key)
+    if plan is None:
+        plan = plans[key] = inheritance_plan(parent_obj, obj)
+    return plan
+
+
+def is_shared(obj):
+    """
+    Whether class ``obj`` is marked as sharing its setup with nested classes.
+
+    I.e. it has a true ``relaxed_shared`` attribute, or the ``relaxed_shared``
+    marker.
+    """
+    if getattr(obj, "relaxed_shared", False):
+        return True
+    marks = getattr(obj, "pytestmark", [])
+    return any(getattr(x, "name", None) == "relaxed_shared" for x in marks)
+
+
+def shared_scope_for(node):
+    """
+    Return the outermost `SharedScope` enclosing ``node``, or ``None``.
+    """
+    scope = None
+    while node is not None:
+        scope = getattr(node, "shared_scope", None) or scope
+        node = node.parent
+    return scope
+
+
+_missing = object()
+
+
+class SharedScope:
+    """
+    Runs an outer class' setup once for all tests in it & its nested classes.
+
+    The class' ``setup_method`` and ``teardown_method`` are removed from
+    pytest's view (so neither it nor our nested class decoration calls them
+    per-test) and are instead called against a single, dedicated instance:
+    setup before the subtree's first test, teardown after its last one.
+
+    Before each test, that instance's attributes are copied onto the test's
+    own instance (so rebinding them in a test does not affect other tests;
+    mutating them, however, does.) Nested classes defining their own
+    ``setup_method``/``teardown_method`` still get those called per-test as
+    usual, after the shared state is in place.
+
+    The class is put back the way it was once the scope is closed.
+    """
+
+    LIFECYCLE = ("setup_method", "teardown_method")
+
+    def __init__(self, cls):
+        self.cls = cls
+        # NOTE: the same class may be collected more than once per session
+        # (eg if given twice on the command line), so its original methods
+        # are kept on it along with a count of scopes using them; the first
+        # scope hides them and the last one to close puts them back.
+        state = cls.__dict__.get("_relaxed_shared_state")
+        if state is None:
+            originals = {
+                name: (cls.__dict__.get(name, _missing), getattr(cls, name))
+                for name in self.LIFECYCLE
+                if hasattr(cls, name)
+            }
+            state = cls._relaxed_shared_state = [originals, 0]
+            # Hide the lifecycle methods from pytest.
+            for name in self.LIFECYCLE:
+                setattr(cls, name, None)
+        state[1] += 1
+        originals = state[0]
+        self.setup = originals.get("setup_method", (None, None))[1]
+        self.teardown = originals.get("teardown_method", (None, None))[1]
+        self.closed = False
+        self.instance = None
+        # Number of selected tests yet to finish; set post-collection.
+        self.remaining = 0
+
+    def enter(self, instance, method):
+        """
+        Prepare test ``instance`` (about to run ``method``.)
+        """
+        if self.instance is None:
+            self.instance = self.cls()
+            _call_lifecycle(self.instance, self.setup, method)
+        instance.__dict__.update(self.instance.__dict__)
+
+    def exit(self, method):
+        """
+        Note that a test (which ran ``method``) finished.
+        """
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.close(method)
+
+    def close(self, method=None):
+        """
+        Tear down the shared instance, if it was set up, and restore the class.
+        """
+        if self.instance is not None:
+            instance, self.instance = self.instance, None
+            _call_lifecycle(instance, self.teardown, method)
+        if not self.closed:
+            self.closed = True
+            self._restore()
+
+    def _restore(self):
+        cls = self.cls
+        state = cls._relaxed_shared_state
+        state[1] -= 1
+        if state[1] > 0:
+            return
+        del cls._relaxed_shared_state
+        for name in self.LIFECYCLE:
+            own, _ = state[0].get(name, (_missing, None))
+            if own is _missing:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, own)
+
+
+def _call_lifecycle(instance, func, method):
+    # Like pytest, only hand over the test method if it's asked for.
+    if func is None:
+        return
+    if func.__code__.co_argcount > 1:
+        func(instance, method)
+    else:
+        func(instance)
+
+
+shared_scopes_key = StashKey[list]()
+
+
 # All other classes in here currently inherit from PyCollector, and it is what
 # defines the default istestfunction/istestclass, so makes sense to inherit
 # from it for our mixin. (PyobjMixin, another commonly found class, offers
@@ -48,12 +248,51 @@ class RelaxedMixin(PyCollector):
     # we test 'obj' for is its membership in a module, which must happen inside
     # SpecModule's override.
 
+    @profiled
     def istestclass(self, obj, name):
         return istestclass(name)
 
+    @profiled
     def istestfunction(self, obj, name):
         return istestfunction(obj, name)
 
+    def make_class(self, obj, name):
+        """
+        Return a `SpecClass` for class ``obj``, or ``[]`` if it's not a test.
+
+        Used by our ``pytest_pycollect_makeitem`` hook, so pytest doesn't build
+        a plain ``Class`` we'd just replace anyway. The returned node is
+        lazy: its (decorated) class object isn't obtained until something -
+        typically its own collection - needs it, which for classes excluded by
+        test ID selection may be never.
+        """
+        if not self.istestclass(obj, name):
+            # NOTE: not None, which would have pytest re-ask the question.
+            return []
+        return SpecClass.from_parent(self, name=name)
+
+    def reorder(self, items):
+        """
+        Apply any configured test ordering to collected ``items``, in-place.
+
+        Returns ``items`` for convenience.
+        """
+        ordering = self.config.stash.get(ordering_key, None)
+        if ordering is not None:
+            ordering.reorder(items, lambda x: not isinstance(x, Class))
+        return items
+
+    def profile_location(self):
+        """
+        Return ``(module test ID, class nesting depth)`` for profiling.
+        """
+        depth = 0
+        node = self
+        while isinstance(node, SpecClass):
+            depth += 1
+            node = node.parent
+        return node.nodeid, depth
+
 
 class SpecModule(RelaxedMixin, Module):
     def _is_test_obj(self, test_func, obj, name):
@@ -70,86 +309,69 @@ class SpecModule(RelaxedMixin, Module):
         # No other complaints -> it's probably good
         return True
 
+    @profiled
     def istestfunction(self, obj, name):
         return self._is_test_obj("istestfunction", obj, name)
 
+    @profiled
     def istestclass(self, obj, name):
         return self._is_test_obj("istestclass", obj, name)
 
+    @profiled
     def collect(self):
         # Given we've overridden naming constraints etc above, just use
         # superclass' collection logic for the rest of the necessary behavior.
+        # NOTE: classes typically come back as SpecClasses already, courtesy
+        # of our pytest_pycollect_makeitem hook; see make_class().
         items = super().collect()
         collected = []
         for item in items:
-            # Replace Class objects with recursive SpecClasses
+            # Replace any other Class objects with recursive SpecClasses
             # NOTE: we could explicitly skip unittest objects here (we'd want
             # them to be handled by pytest's own unittest support) but since
             # those are almost always in test_prefixed_filenames anyways...meh
-            if isinstance(item, Class):
+            if isinstance(item, Class) and not isinstance(item, SpecClass):
                 item = SpecClass.from_parent(item.parent, name=item.name)
             collected.append(item)
-        return collected
+        return self.reorder(collected)
 
 
 class SpecClass(RelaxedMixin, Class):
+    @profiled
     def _getobj(self):
         # Regular object-making first
         obj = super()._getobj()
-        # Short circuit if this obj isn't a nested class (aka child):
+        # Only decorate if this obj is a nested class (aka child):
         # - no parent attr: implies module-level obj definition
         # - parent attr, but isn't a class: implies method
-        if not hasattr(self, "parent") or not isinstance(
-            self.parent, SpecClass
-        ):
-            return obj
-        # Then decorate it with our parent's extra attributes, allowing nested
-        # test classes to appear as an aggregate of parents' "scopes".
-        parent_obj = self.parent.obj
-        # Obtain parent attributes, etc not found on our obj (serves as both a
-        # useful identifier of "stuff added to an outer class" and a way of
-        # ensuring that we can override such attrs), and set them on obj
-        delta = set(dir(parent_obj)).difference(set(dir(obj)))
-        for name in delta:
-            value = getattr(parent_obj, name)
-            # Pytest's pytestmark attributes always get skipped, we don't want
-            # to spread that around where it's not wanted. (Besides, it can
-            # cause a lot of collection level warnings.)
-            if name == "pytestmark":
-                continue
-            # Classes get skipped; they'd always just be other 'inner' classes
-            # that we don't want to copy elsewhere.
-            if isinstance(value, type):
-                continue
-            # Functions (methods) may get skipped, or not, depending:
-            # NOTE: as of pytest 7, for some reason the value appears as a
-            # function and not a method (???) so covering both bases...
-            if isinstance(value, (types.MethodType, types.FunctionType)):
-                # If they look like tests, they get skipped; don't want to copy
-                # tests around!
-                if istestfunction(obj, name):
-                    continue
-                # Non-test == they're probably lifecycle methods
-                # (setup/teardown) or helpers (_do_thing). Rebind them to the
-                # target instance, otherwise the 'self' in the setup/helper is
-                # not the same 'self' as that in the actual test method it runs
-                # around or within!
-                setattr(obj, name, value)
-            # Anything else should be some data-type attribute, which is copied
-            # verbatim / by-value.
-            else:
-                setattr(obj, name, value)
+        if hasattr(self, "parent") and isinstance(self.parent, SpecClass):
+            # Decorate it with our parent's extra attributes, allowing nested
+            # test classes to appear as an aggregate of parents' "scopes".
+            parent_obj = self.parent.obj
+            plan = cached_inheritance_plan(self.config, parent_obj, obj)
+            for name in plan:
+                setattr(obj, name, getattr(parent_obj, name))
+        # The outermost class marked as sharing its setup is in charge of that
+        # for its whole subtree.
+        if is_shared(obj) and shared_scope_for(self) is None:
+            self.shared_scope = SharedScope(obj)
+            self.config.stash.setdefault(shared_scopes_key, []).append(
+                self.shared_scope
+            )
         return obj
 
+    @profiled
     def collect(self):
         ret = []
         for item in super().collect():
             # More pytestmark skipping.
             if item.name == "pytestmark":
                 continue
-            if isinstance(item, Class):
+            # Replace any other nested Class objects with recursive
+            # SpecClasses (see SpecModule.collect).
+            if isinstance(item, Class) and not isinstance(item, SpecClass):
                 item = SpecClass.from_parent(
-                    parent=item.parent, name=item.name, obj=item.obj
+                    parent=item.parent, name=item.name
                 )
             ret.append(item)
-        return ret
+        return self.reorder(ret)
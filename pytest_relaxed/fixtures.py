@@ -1,6 +1,227 @@
 import os
+from collections.abc import MutableMapping
 
-from pytest import fixture
+from pytest import Class, Module, StashKey, fixture
+
+from .classes import shared_scope_for
+
+
+_missing = object()
+
+
+class EnvironTracker(MutableMapping):
+    """
+    Mapping proxying ``os.environ``, remembering the original of changed keys.
+
+    Only the first change to any given key records anything, so both the
+    tracking and `restore` cost scales with the number of keys touched, not
+    with the size of the environment.
+
+    Trackers may be stacked, by sharing one ``layers`` list (kept sorted by
+    ``depth``, outermost first); see `_remember`.
+    """
+
+    def __init__(self, environ=None, layers=None, depth=0):
+        self.environ = os.environ if environ is None else environ
+        # key -> value prior to our first change (or _missing if unset)
+        self.originals = {}
+        self.layers = [] if layers is None else layers
+        self.depth = depth
+
+    def tracks(self, key):
+        return key in self.originals
+
+    def original(self, key):
+        return self.originals.get(key, _missing)
+
+    def set_original(self, key, value):
+        self.originals[key] = value
+
+    def _remember(self, key):
+        """
+        Record ``key``'s original value, returning any inner layers to update.
+
+        Inner (narrower scoped) layers may have already changed ``key``, in
+        which case the value to record is the one from before the outermost
+        of those changed it. And as they'll be restored before us, they must
+        restore to whatever we're about to write instead.
+        """
+        inner = [
+            x for x in self.layers if x.depth > self.depth and x.tracks(key)
+        ]
+        if key not in self.originals:
+            if inner:
+                self.originals[key] = inner[0].original(key)
+            else:
+                self.originals[key] = self.environ.get(key, _missing)
+        return inner
+
+    def __getitem__(self, key):
+        return self.environ[key]
+
+    def __setitem__(self, key, value):
+        inner = self._remember(key)
+        self.environ[key] = value
+        for layer in inner:
+            layer.set_original(key, value)
+
+    def __delitem__(self, key):
+        # Let the real mapping raise KeyError before recording anything.
+        if key not in self.environ:
+            raise KeyError(key)
+        inner = self._remember(key)
+        del self.environ[key]
+        for layer in inner:
+            layer.set_original(key, _missing)
+
+    def __iter__(self):
+        return iter(self.environ)
+
+    def __len__(self):
+        return len(self.environ)
+
+    def __repr__(self):
+        return "<{} {!r}>".format(type(self).__name__, self.environ)
+
+    def copy(self):
+        return self.environ.copy()
+
+    def restore(self):
+        """
+        Put every changed key back the way it was, then forget about them.
+        """
+        for key, value in self.originals.items():
+            if value is _missing:
+                self.environ.pop(key, None)
+            else:
+                self.environ[key] = value
+        self.originals.clear()
+
+
+class EnvironSnapshot:
+    """
+    Copy of ``os.environ`` which can be restored in place, by diffing.
+
+    Unlike rebinding ``os.environ`` to a copy, `restore` writes back only the
+    keys which differ, into the real mapping, so e.g. ``putenv`` stays in
+    sync and nobody holding a reference to ``os.environ`` is left behind.
+
+    May also act as the innermost layer beneath some `EnvironTracker` objects.
+    """
+
+    def __init__(self, environ=None, depth=0):
+        self.environ = os.environ if environ is None else environ
+        self.originals = dict(self.environ)
+        self.depth = depth
+
+    def tracks(self, key):
+        return True
+
+    def original(self, key):
+        return self.originals.get(key, _missing)
+
+    def set_original(self, key, value):
+        if value is _missing:
+            self.originals.pop(key, None)
+        else:
+            self.originals[key] = value
+
+    def restore(self):
+        """
+        Put the environment back the way it was when snapshotted.
+        """
+        environ, originals = self.environ, self.originals
+        current = dict(environ)
+        # NOTE: the common case (nothing changed) is a single C-level compare.
+        if current == originals:
+            return
+        for key in current.keys() - originals.keys():
+            del environ[key]
+        for key, value in originals.items() - current.items():
+            environ[key] = value
+
+
+# EnvironRecorders currently recording; see _RecordingEnviron.
+_recorders = []
+
+
+class _RecordingEnviron(os._Environ):
+    """
+    Stand-in class for ``os.environ`` while any `EnvironRecorder` is active.
+
+    Every other mutating method (``pop``, ``update``, ``setdefault`` etc) goes
+    through these two.
+    """
+
+    def __setitem__(self, key, value):
+        for recorder in _recorders:
+            recorder._remember(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        for recorder in _recorders:
+            recorder._remember(key)
+        super().__delitem__(key)
+
+
+class EnvironRecorder:
+    """
+    Records the original value of each ``os.environ`` key changed, by anyone.
+
+    While recording, the real ``os.environ`` object's class is swapped for a
+    recording subclass; so identity (and ``putenv`` syncing) is unaffected,
+    writes from code under test are seen too, and `restore` only touches the
+    keys which changed. Neither setup nor teardown depend on the size of the
+    environment.
+
+    May also act as the innermost layer beneath some `EnvironTracker` objects.
+    """
+
+    def __init__(self, environ=None, depth=0):
+        self.environ = os.environ if environ is None else environ
+        # key -> value prior to its first change (or _missing if unset)
+        self.originals = {}
+        self.depth = depth
+
+    @classmethod
+    def supports(cls, environ):
+        return type(environ) in (os._Environ, _RecordingEnviron)
+
+    def start(self):
+        _recorders.append(self)
+        self.environ.__class__ = _RecordingEnviron
+
+    def stop(self):
+        _recorders.remove(self)
+        if not _recorders:
+            self.environ.__class__ = os._Environ
+
+    def _remember(self, key):
+        if key not in self.originals:
+            self.originals[key] = self.environ.get(key, _missing)
+
+    def tracks(self, key):
+        return True
+
+    def original(self, key):
+        if key in self.originals:
+            return self.originals[key]
+        return self.environ.get(key, _missing)
+
+    def set_original(self, key, value):
+        self.originals[key] = value
+
+    def restore(self):
+        """
+        Stop recording, then put every changed key back the way it was.
+        """
+        self.stop()
+        for key, value in self.originals.items():
+            if value is _missing:
+                self.environ.pop(key, None)
+            else:
+                self.environ[key] = value
+        self.originals.clear()
 
 
 # TODO: consider making this a "no param/funcarg required" fixture (i.e. one
@@ -10,13 +231,135 @@ from pytest import fixture
 # the yielded value (like proxying or whatever.) See the pytest 3.1.2 docs at:
 # /fixture.html#using-fixtures-from-classes-modules-or-projects
 @fixture
-def environ():
+def environ(request):
     """
     Enforce restoration of current shell environment after modifications.
 
-    Yields the ``os.environ`` dict after snapshotting it; restores the original
-    value (wholesale) during fixture teardown.
+    Yields the ``os.environ`` dict itself; during fixture teardown, every key
+    changed since setup (by anything) is put back in place. See
+    `EnvironRecorder` (or, if ``os.environ`` has been replaced by some other
+    mapping, `EnvironSnapshot`.)
+    """
+    depth = len(request.node.listchain())
+    if EnvironRecorder.supports(os.environ):
+        layer = EnvironRecorder(depth=depth)
+        layer.start()
+    else:
+        layer = EnvironSnapshot(depth=depth)
+    layers = _active_layers(request.session)
+    _push(layers, layer)
+    try:
+        yield os.environ
+    finally:
+        layers.remove(layer)
+        layer.restore()
+
+
+environ_layer_key = StashKey[EnvironTracker]()
+environ_layers_key = StashKey[list]()
+
+
+def _active_layers(session):
+    # Every tracker/snapshot currently in effect, outermost first.
+    return session.stash.setdefault(environ_layers_key, [])
+
+
+def _push(layers, layer):
+    layers.append(layer)
+    layers.sort(key=lambda x: x.depth)
+
+
+def _node_layer(node):
+    # One tracker per collector node, restored when that node is torn down.
+    tracker = node.stash.get(environ_layer_key, None)
+    if tracker is None:
+        layers = _active_layers(node.session)
+        tracker = EnvironTracker(layers=layers, depth=len(node.listchain()))
+        node.stash[environ_layer_key] = tracker
+        _push(layers, tracker)
+
+        def restore():
+            layers.remove(tracker)
+            tracker.restore()
+            del node.stash[environ_layer_key]
+
+        node.addfinalizer(restore)
+    return tracker
+
+
+# NOTE: the wider scoped variants are themselves function-scoped (so they're
+# usable from any test, setup fixture etc) and hand out a tracker stashed on
+# the relevant collector. Layers stack: pytest tears nodes down innermost
+# first, and each layer records a key's value from before any layer inside it
+# changed it (see EnvironTracker._remember), so every layer restores what was
+# in place before it. Nested spec classes thus get their own layer on top of
+# their parents', whose changes stay visible throughout.
+@fixture
+def class_environ(request):
+    """
+    Like `environ`, but changes last until the end of the current class.
+
+    The current class is the innermost one, for tests in nested classes; tests
+    not in any class get the module's layer (as with ``module_environ``).
+    """
+    node = request.node.getparent(Class) or request.node.getparent(Module)
+    return _node_layer(node)
+
+
+@fixture
+def module_environ(request):
+    """
+    Like `environ`, but changes last until the end of the current module.
+    """
+    return _node_layer(request.node.getparent(Module))
+
+
+@fixture
+def session_environ(request):
+    """
+    Like `environ`, but changes last until the end of the test session.
+    """
+    return _node_layer(request.session)
+
+
+def use_shared_scope(item):
+    """
+    Have test ``item`` request the `_relaxed_shared_scope` fixture.
+
+    It goes ahead of the item's other function-scoped fixtures (which include
+    pytest's own ``setup_method`` handling), i.e. where an autouse fixture
+    from a plugin would be.
+    """
+    names = item.fixturenames
+    if "_relaxed_shared_scope" in names:
+        return
+    defs = item._fixtureinfo.name2fixturedefs
+    index = next(
+        (
+            i
+            for i, name in enumerate(names)
+            if name in defs and defs[name][-1].scope == "function"
+        ),
+        len(names),
+    )
+    names.insert(index, "_relaxed_shared_scope")
+
+
+# NOTE: not autouse; only tests under a SharedScope get this (see
+# use_shared_scope) so nobody else pays for it.
+@fixture
+def _relaxed_shared_scope(request):
+    """
+    Set up tests within classes marked ``relaxed_shared`` from shared state.
+
+    See `.classes.SharedScope`.
     """
-    current_environ = os.environ.copy()
-    yield os.environ
-    os.environ = current_environ
+    scope = shared_scope_for(request.node)
+    if scope is None or request.instance is None:
+        yield
+        return
+    scope.enter(request.instance, request.function)
+    try:
+        yield
+    finally:
+        scope.exit(request.function)
@@ -0,0 +1,59 @@
+"""
+Machine-readable, streaming counterpart to the verbose spec-style display.
+
+Enabled via ``--relaxed-report-jsonl=PATH``.
+"""
+
+import json
+import os
+
+from .reporter import name_cache
+
+
+class SpecReportWriter:
+    """
+    Writes one JSON record per line to a file, as test results come in.
+
+    Records are written for each test's ``call`` phase, plus any setup or
+    teardown phase which didn't pass (e.g. skips from setup, or errors.) Each
+    line is flushed once written, so the file may be tailed/consumed while the
+    run is still in progress.
+
+    Record keys:
+
+    - ``nodeid``: the test ID;
+    - ``module``: the module path portion of the test ID;
+    - ``headers``: list of display names for the enclosing classes, outermost
+      first, as seen in verbose output;
+    - ``name``: display name of the test itself;
+    - ``depth``: indentation depth, i.e. the number of headers;
+    - ``when``: which test phase the record is for;
+    - ``outcome``: ``"passed"``, ``"failed"`` or ``"skipped"``;
+    - ``duration``: phase duration, in seconds.
+    """
+
+    def __init__(self, config, path):
+        self.names = name_cache(config)
+        self.path = os.path.abspath(path)
+        self.fd = open(self.path, "w", encoding="utf-8")
+
+    def pytest_runtest_logreport(self, report):
+        if report.when != "call" and report.passed:
+            return
+        module, headers, leaf = self.names.split(report.nodeid)
+        transform = self.names.transform_name
+        record = {
+            "nodeid": report.nodeid,
+            "module": module,
+            "headers": [transform(x) for x in headers],
+            "name": transform(leaf),
+            "depth": len(headers),
+            "when": report.when,
+            "outcome": report.outcome,
+            "duration": report.duration,
+        }
+        self.fd.write(json.dumps(record) + "\n")
+        self.fd.flush()
+
+    def pytest_unconfigure(self):
+        self.fd.close()
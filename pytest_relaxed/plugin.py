@@ -1,17 +1,127 @@
+import inspect
+import sys
+
 import pytest
 
-from .classes import SpecModule
-from .reporter import RelaxedReporter
+from .classes import (
+    RelaxedMixin,
+    SpecModule,
+    shared_scope_for,
+    shared_scopes_key,
+)
+from .profiling import CollectionProfiler, profiler_key
+from .spec_index import is_private, is_spec_file
+from .timings import (
+    DeselectionForwarder,
+    DurationRecorder,
+    FailFastOrder,
+    load_durations,
+    ordering_key,
+)
 
 # NOTE: fixtures must be present in the module listed under our setup.py's
 # pytest11 entry_points value (i.e., this one.) Just being in the import path
 # (e.g. package __init__.py) was not sufficient!
-from .fixtures import environ  # noqa
+from .fixtures import (  # noqa
+    environ,
+    class_environ,
+    module_environ,
+    session_environ,
+    _relaxed_shared_scope,
+    use_shared_scope,
+)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("relaxed")
+    group.addoption(
+        "--relaxed-report-jsonl",
+        metavar="PATH",
+        help="Stream a JSON record per test result to PATH, one per line.",
+    )
+    group.addoption(
+        "--relaxed-reporter",
+        choices=("auto", "on", "off"),
+        default="auto",
+        help="Whether to use relaxed's nested verbose display. 'auto' (the "
+        "default) only does so in verbose mode, and never on xdist workers.",
+    )
+    group.addoption(
+        "--relaxed-progress",
+        action="store_true",
+        help="In verbose mode, display a live footer with tests/second, ETA "
+        "and the slowest running spec class.",
+    )
+    group.addoption(
+        "--relaxed-dist",
+        action="store_true",
+        help="Under pytest-xdist, keep each top level spec class (and its "
+        "nested classes) on a single worker, balancing by past durations.",
+    )
+    group.addoption(
+        "--relaxed-order",
+        choices=("definition", "fail-fast"),
+        default="definition",
+        help="Order of tests within each class/module. 'fail-fast' runs "
+        "last run's failures first, then the rest fastest first (default: "
+        "definition).",
+    )
+    group.addoption(
+        "--relaxed-profile-collection",
+        action="store_true",
+        help="Time relaxed's collection steps & display the slowest ones.",
+    )
+    group.addoption(
+        "--relaxed-profile-top",
+        type=int,
+        default=20,
+        metavar="N",
+        help="Number of collection profile rows to display (<=0 for all).",
+    )
+    group.addoption(
+        "--relaxed-profile-json",
+        metavar="PATH",
+        help="Also write the full collection profile to PATH as JSON.",
+    )
+    parser.addini(
+        "relaxed_name_cache_size",
+        default="8192",
+        help="Max entries in relaxed's test ID/name display caches (<=0 for "
+        "no limit).",
+    )
+    parser.addini(
+        "relaxed_output_buffer_size",
+        default="8192",
+        help="Characters of verbose output to buffer before writing it to the "
+        "terminal (0 to disable buffering).",
+    )
+    parser.addini(
+        "relaxed_output_flush_interval",
+        default="0.5",
+        help="Max seconds to hold buffered verbose output before writing it.",
+    )
+    parser.addini(
+        "relaxed_progress_interval",
+        default="0.5",
+        help="Min seconds between --relaxed-progress footer redraws.",
+    )
+    parser.addini(
+        "relaxed_progress_line_interval",
+        default="30",
+        help="Seconds between --relaxed-progress status lines when output "
+        "isn't a terminal (and so can't have a footer redrawn in place).",
+    )
+    parser.addini(
+        "relaxed_name_cache_stats",
+        type="bool",
+        default=False,
+        help="Display relaxed's name cache hit/miss counts after the run.",
+    )
 
 
 def pytest_ignore_collect(collection_path, config):
     # Ignore files and/or directories marked as private via Python convention.
-    return collection_path.name.startswith("_")
+    return is_private(collection_path.name)
 
 
 # We need to use collect_file, not pycollect_makemodule, as otherwise users
@@ -20,31 +130,175 @@ def pytest_ignore_collect(collection_path, config):
 # so maybe find a way to make that config bit default somehow (update
 # docs/changelog appropriately), and then switch  hooks?
 def pytest_collect_file(file_path, parent):
-    # Modify file selection to choose all .py files besides conftest.py.
-    # (Skipping underscored names is handled up in pytest_ignore_collect, which
-    # applies to directories too.)
-    if (
-        file_path.suffix != ".py"
-        or file_path.name == "conftest.py"
-        # Also skip anything prefixed with test_; pytest's own native
-        # collection will get that stuff, and we don't _want_ to try modifying
-        # such files anyways.
-        or file_path.name.startswith("test_")
-    ):
+    # Modify file selection to choose all .py files besides conftest.py and
+    # test_ prefixed files. (Skipping underscored names is handled up in
+    # pytest_ignore_collect, which applies to directories too.) NOTE: this is
+    # a pure name check on purpose; pytest walks the tree itself, and files
+    # may appear mid-collection (eg written by a conftest.)
+    if not is_spec_file(file_path.name):
         return
     # Then use our custom module class which performs modified
     # function/class selection as well as class recursion
     return SpecModule.from_parent(parent=parent, path=file_path)
 
 
+def pytest_pycollect_makeitem(collector, name, obj):
+    # Have our own collectors build (recursive, lazy) SpecClasses directly.
+    if isinstance(collector, RelaxedMixin) and inspect.isclass(obj):
+        return collector.make_class(obj, name)
+
+
 @pytest.mark.trylast  # So we can be sure builtin terminalreporter exists
 def pytest_configure(config):
-    # TODO: we _may_ sometime want to do the isatty/slaveinput/etc checks that
-    # pytest-sugar does?
+    if config.getoption("relaxed_profile_collection"):
+        config.stash[profiler_key] = CollectionProfiler()
+    # Reports all flow to the xdist controller, so only it writes them out.
+    jsonl_path = config.getoption("relaxed_report_jsonl")
+    if jsonl_path and not hasattr(config, "workerinput"):
+        from .jsonl import SpecReportWriter
+
+        writer = SpecReportWriter(config, jsonl_path)
+        config.pluginmanager.register(writer, "relaxed-jsonl")
+    # Test durations are tracked (by the xdist controller, if applicable) for
+    # features that need them.
+    fail_fast = config.getoption("relaxed_order") == "fail-fast"
+    if fail_fast:
+        config.stash[ordering_key] = FailFastOrder(config)
+    needs_durations = fail_fast or config.getoption("relaxed_dist")
+    if needs_durations and not hasattr(config, "workerinput"):
+        recorder = DurationRecorder(config)
+        config.pluginmanager.register(recorder, "relaxed-durations")
+    elif needs_durations:
+        forwarder = DeselectionForwarder(config)
+        config.pluginmanager.register(forwarder, "relaxed-deselections")
+    config.addinivalue_line(
+        "markers",
+        "relaxed_shared: run this spec class' setup_method/teardown_method "
+        "once for all of its (and its nested classes') tests.",
+    )
+    if not wants_reporter(config):
+        return
     builtin = config.pluginmanager.getplugin("terminalreporter")
+    # NOTE: imported here, like other optional machinery, to keep plugin
+    # loading cheap for runs which end up not needing it.
+    from .reporter import RelaxedReporter
+
     # Pass the configured, instantiated builtin terminal reporter to our
     # instance so it can refer to e.g. the builtin reporter's configuration
     ours = RelaxedReporter(builtin)
     # Unregister the builtin first so only our output appears
     config.pluginmanager.unregister(builtin)
     config.pluginmanager.register(ours, "terminalreporter")
+
+
+def wants_reporter(config):
+    """
+    Whether to swap pytest's terminal reporter for our own.
+    """
+    mode = config.getoption("relaxed_reporter")
+    # Nothing to swap out, eg under -p no:terminal.
+    if mode == "off" or not config.pluginmanager.has_plugin(
+        "terminalreporter"
+    ):
+        return False
+    if mode == "on":
+        return True
+    # Our display only differs in verbose mode; and xdist workers display
+    # nothing at all, their reports going to the controller instead.
+    return config.option.verbose > 0 and not hasattr(config, "workerinput")
+
+
+@pytest.hookimpl(optionalhook=True, tryfirst=True)
+def pytest_xdist_make_scheduler(config, log):
+    if not config.getoption("relaxed_dist"):
+        return None
+    # NOTE: imported here as xdist is optional.
+    from .scheduling import SpecScopeScheduling
+
+    return SpecScopeScheduling(config, log, durations=load_durations(config))
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    # Shared spec class state is torn down after the last of its tests that's
+    # actually going to run, so count those once selection is final.
+    for scope in config.stash.get(shared_scopes_key, []):
+        scope.remaining = 0
+    for item in items:
+        scope = shared_scope_for(item)
+        if scope is not None:
+            scope.remaining += 1
+            use_shared_scope(item)
+
+
+def pytest_collection_finish(session):
+    # xdist workers hand their collection profile to the controller, which
+    # collects nothing itself; see pytest_testnodedown.
+    config = session.config
+    profiler = config.stash.get(profiler_key, None)
+    if profiler is not None and hasattr(config, "workeroutput"):
+        config.workeroutput["relaxed_profile"] = profiler.rows()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    profiler = node.config.stash.get(profiler_key, None)
+    rows = getattr(node, "workeroutput", {}).get("relaxed_profile")
+    if profiler is not None and rows:
+        profiler.merge(rows)
+
+
+def relaxed_reporter(config):
+    """
+    Return our terminal reporter, if it's the one in use, else ``None``.
+    """
+    # NOTE: if our reporter module was never imported, it can't be in use
+    # either; no sense importing it just to find that out.
+    module = sys.modules.get(__package__ + ".reporter")
+    reporter = config.pluginmanager.getplugin("terminalreporter")
+    if module is not None and isinstance(reporter, module.RelaxedReporter):
+        return reporter
+    return None
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    # Tear down shared spec class state left over by interrupted runs (eg -x)
+    # or by tests being split across xdist workers.
+    for scope in config.stash.get(shared_scopes_key, []):
+        scope.close()
+    # Get any buffered verbose output out before the summary starts. (The
+    # terminal reporter writes some of that directly, bypassing our flushes.)
+    reporter = relaxed_reporter(config)
+    if reporter is not None:
+        reporter.flush_groups()
+        reporter.flush_output()
+    profiler = config.stash.get(profiler_key, None)
+    path = config.getoption("relaxed_profile_json")
+    # NOTE: xdist workers get our CLI options too, but only the controller
+    # should write the file.
+    if profiler is not None and path and not hasattr(config, "workerinput"):
+        profiler.dump(path)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    profiler = config.stash.get(profiler_key, None)
+    if profiler is not None:
+        profiler.write_table(
+            terminalreporter, top=config.getoption("relaxed_profile_top")
+        )
+    # Only report on the name cache if asked, and if something (typically our
+    # reporter) actually set one up.
+    if not config.getini("relaxed_name_cache_stats"):
+        return
+    from .reporter import name_cache_key
+
+    cache = config.stash.get(name_cache_key, None)
+    if cache is not None:
+        terminalreporter.write_sep("-", "relaxed name cache")
+        for name, info in cache.stats().items():
+            terminalreporter.write_line(
+                "{}: {} hits, {} misses, {}/{} entries".format(
+                    name, info.hits, info.misses, info.currsize, info.maxsize
+                )
+            )
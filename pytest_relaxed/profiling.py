@@ -0,0 +1,124 @@
+"""
+Opt-in timing of relaxed's collection machinery.
+
+Enabled via ``--relaxed-profile-collection``; see `profiled` for how methods
+get instrumented, and `CollectionProfiler` for what's recorded.
+"""
+
+import json
+from functools import wraps
+from time import perf_counter
+
+from pytest import StashKey
+
+
+class CollectionProfiler:
+    """
+    Aggregates wall time & call counts for instrumented collection methods.
+
+    Timings are keyed by ``(operation, module, depth)``, where ``operation`` is
+    the instrumented method's qualified name, ``module`` is the test ID of the
+    module being collected, and ``depth`` is the class nesting level (``0`` for
+    the module itself, ``1`` for top level classes, and so on.)
+
+    Timings are inclusive; e.g. ``SpecModule.collect`` includes the time spent
+    in the predicate methods it calls.
+
+    Under xdist, each worker profiles its own collection and the controller
+    `merge`s them, so figures are totals across all workers.
+    """
+
+    def __init__(self):
+        # (operation, module, depth) -> [calls, seconds]
+        self.timings = {}
+
+    def record(self, operation, module, depth, elapsed):
+        entry = self.timings.setdefault((operation, module, depth), [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def merge(self, rows):
+        """
+        Add in timing dicts (as from `rows`) profiled elsewhere.
+        """
+        for row in rows:
+            key = (row["operation"], row["module"], row["depth"])
+            entry = self.timings.setdefault(key, [0, 0.0])
+            entry[0] += row["calls"]
+            entry[1] += row["seconds"]
+
+    def rows(self):
+        """
+        Return timing dicts, sorted by total time, slowest first.
+        """
+        rows = [
+            {
+                "operation": operation,
+                "module": module,
+                "depth": depth,
+                "calls": calls,
+                "seconds": seconds,
+            }
+            for (operation, module, depth), (calls, seconds) in (
+                self.timings.items()
+            )
+        ]
+        return sorted(rows, key=lambda x: x["seconds"], reverse=True)
+
+    def write_table(self, terminalreporter, top=None):
+        """
+        Write the ``top`` slowest rows (or all of them) as a text table.
+        """
+        rows = self.rows()
+        if top is not None and top > 0:
+            rows = rows[:top]
+        terminalreporter.write_sep("-", "relaxed collection profile")
+        template = "{:>10} {:>8}  {:<32} {:>5}  {}"
+        terminalreporter.write_line(
+            template.format("seconds", "calls", "operation", "depth", "module")
+        )
+        for row in rows:
+            terminalreporter.write_line(
+                template.format(
+                    "{:.4f}".format(row["seconds"]),
+                    row["calls"],
+                    row["operation"],
+                    row["depth"],
+                    row["module"],
+                )
+            )
+
+    def dump(self, path):
+        """
+        Write all rows to ``path`` as JSON.
+        """
+        with open(path, "w") as fd:
+            json.dump(self.rows(), fd, indent=2)
+
+
+profiler_key = StashKey[CollectionProfiler]()
+
+
+def profiled(method):
+    """
+    Time calls to collector ``method`` when collection profiling is enabled.
+
+    Calls are recorded under the method's ``__qualname__``, and the collector
+    instance's ``profile_location()``. When profiling is disabled, the only
+    overhead is a single stash lookup.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.config.stash.get(profiler_key, None)
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            module, depth = self.profile_location()
+            profiler.record(method.__qualname__, module, depth, elapsed)
+
+    return wrapper
@@ -0,0 +1,84 @@
+"""
+Live progress & throughput status for verbose mode.
+
+Enabled via ``--relaxed-progress``; see `Progress` for what's tracked, and
+`.reporter.RelaxedReporter` for how it's displayed.
+"""
+
+from time import perf_counter
+
+
+def format_duration(seconds):
+    """
+    Format ``seconds`` compactly, e.g. ``"4.2s"``, ``"3m07s"`` or ``"1h02m"``.
+    """
+    if seconds < 10:
+        return "{:.1f}s".format(seconds)
+    seconds = int(seconds)
+    if seconds < 60:
+        return "{}s".format(seconds)
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return "{}m{:02d}s".format(minutes, seconds)
+    hours, minutes = divmod(minutes, 60)
+    return "{}h{:02d}m".format(hours, minutes)
+
+
+class Progress:
+    """
+    Tracks completed & running tests, to summarize how a run is going.
+
+    Tests count as running from their ``logstart`` until their teardown is
+    reported. ``classes`` is a callable turning a test ID into the display
+    name of its spec class (or ``None`` for tests outside classes.)
+    """
+
+    def __init__(self, total, classes):
+        self.total = total
+        self.classes = classes
+        self.completed = 0
+        self.started = perf_counter()
+        # nodeid -> start time
+        self.running = {}
+
+    def start(self, nodeid, now=None):
+        self.running[nodeid] = perf_counter() if now is None else now
+
+    def finish(self, nodeid):
+        if self.running.pop(nodeid, None) is not None:
+            self.completed += 1
+
+    def slowest(self, now):
+        """
+        Return ``(spec class, seconds)`` for the longest running test, if any.
+        """
+        if not self.running:
+            return None
+        nodeid, started = min(self.running.items(), key=lambda x: x[1])
+        return self.classes(nodeid), now - started
+
+    def status(self, now=None):
+        """
+        Return a one-line summary of progress so far.
+        """
+        now = perf_counter() if now is None else now
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.completed / elapsed
+        parts = []
+        if self.total:
+            percent = 100 * self.completed // self.total
+            parts.append(
+                "[{}/{} {}%]".format(self.completed, self.total, percent)
+            )
+        parts.append("{:.1f} tests/s".format(rate))
+        if self.total and rate:
+            remaining = (self.total - self.completed) / rate
+            parts.append("ETA {}".format(format_duration(remaining)))
+        slowest = self.slowest(now)
+        if slowest is not None:
+            name, seconds = slowest
+            if name:
+                parts.append(
+                    "slowest: {} ({})".format(name, format_duration(seconds))
+                )
+        return " ".join(parts)
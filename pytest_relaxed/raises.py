@@ -1,18 +1,44 @@
-from decorator import decorator
+from contextlib import contextmanager
+from functools import wraps
+from inspect import iscoroutinefunction
+
+
+@contextmanager
+def _expecting(klass):
+    try:
+        yield
+    except klass:
+        pass
+    else:
+        raise Exception("Did not receive expected {}!".format(klass.__name__))
 
 
 # Thought pytest.raises was like nose.raises, but nooooooo. So let's make it
 # like that.
 def raises(klass):
+    # NOTE: imported here so merely loading pytest-relaxed (e.g. as a plugin)
+    # doesn't pay for it.
+    from decorator import decorator
+
     @decorator
     def inner(f, *args, **kwargs):
-        try:
+        with _expecting(klass):
             f(*args, **kwargs)
-        except klass:
-            pass
-        else:
-            raise Exception(
-                "Did not receive expected {}!".format(klass.__name__)
-            )
-
-    return inner
+
+    # NOTE: only decorator 5+ knows about coroutine functions, so they get a
+    # plain functools.wraps wrapper instead; its __wrapped__ still exposes the
+    # original signature (eg for fixture injection.)
+    def async_inner(f):
+        @wraps(f)
+        async def wrapper(*args, **kwargs):
+            with _expecting(klass):
+                await f(*args, **kwargs)
+
+        return wrapper
+
+    def wrap(f):
+        if iscoroutinefunction(f):
+            return async_inner(f)
+        return inner(f)
+
+    return wrap
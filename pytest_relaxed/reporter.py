@@ -1,5 +1,9 @@
 import re
+from collections import Counter
+from functools import lru_cache
+from time import perf_counter
 
+from pytest import StashKey, hookimpl
 from _pytest.terminal import TerminalReporter
 
 
@@ -24,6 +28,183 @@ TEST_PREFIX = re.compile(r"^(Test|test_)")
 TEST_SUFFIX = re.compile(r"(Test|_test)$")
 
 
+def split(id_):
+    """
+    Split a test ID into its module, headers and leaf (test) name.
+
+    Headers are returned as a tuple, so results are safe to share/cache.
+    """
+    # Split on pytest's :: joiner; the first segment is the module path.
+    module, *headers = id_.split("::")
+    # Last one is the actual test being reported on, not a header
+    leaf = headers.pop()
+    return module, tuple(headers), leaf
+
+
+def transform_name(name):
+    """
+    Take a test class/module/function name and make it human-presentable.
+    """
+    # TestPrefixes / test_prefixes -> stripped
+    name = TEST_PREFIX.sub("", name)
+    # TestSuffixes / suffixed_test -> stripped
+    name = TEST_SUFFIX.sub("", name)
+    # All underscores become spaces, for sentence-ishness
+    name = name.replace("_", " ")
+    return name
+
+
+class NameCache:
+    """
+    Bounded, memoizing front-end to `split` and `transform_name`.
+
+    Test IDs are typically split multiple times per report, and the same class
+    names get transformed over and over throughout a run; this ensures each is
+    only computed once (so long as it stays within the LRU's ``maxsize``.)
+    """
+
+    def __init__(self, maxsize=None):
+        self.split = lru_cache(maxsize=maxsize)(split)
+        self.transform_name = lru_cache(maxsize=maxsize)(transform_name)
+
+    def stats(self):
+        """
+        Return ``{"split": <info>, "transform_name": <info>}``.
+
+        Values are the ``functools.lru_cache`` ``CacheInfo`` tuples, i.e. they
+        expose ``hits``, ``misses``, ``maxsize`` and ``currsize``.
+        """
+        return {
+            "split": self.split.cache_info(),
+            "transform_name": self.transform_name.cache_info(),
+        }
+
+
+name_cache_key = StashKey[NameCache]()
+
+
+def name_cache(config):
+    """
+    Return the session-wide `NameCache` for ``config``, creating if necessary.
+
+    Its size comes from the ``relaxed_name_cache_size`` ini setting; a value
+    of ``0`` or below means "unbounded".
+    """
+    cache = config.stash.get(name_cache_key, None)
+    if cache is None:
+        maxsize = int(config.getini("relaxed_name_cache_size"))
+        cache = NameCache(maxsize=maxsize if maxsize > 0 else None)
+        config.stash[name_cache_key] = cache
+    return cache
+
+
+class HeaderNode:
+    """
+    One class/nested class header within a `HeaderIndex`.
+
+    Tracks the display-ready (i.e. transformed) name, the indent depth, and any
+    child headers seen so far, keyed by their raw nodeid segment.
+    """
+
+    __slots__ = ("display", "depth", "children")
+
+    def __init__(self, display, depth):
+        self.display = display
+        self.depth = depth
+        self.children = {}
+
+
+class HeaderIndex:
+    """
+    Prefix trie of already-displayed headers, keyed on nodeid segments.
+
+    Only the headers for the current module are retained; moving on to a new
+    module drops the previous module's trie so memory stays bounded on large
+    runs.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, module=None):
+        self.module = module
+        self.root = HeaderNode(display=None, depth=-1)
+
+    def visit(self, module, headers, transform):
+        """
+        Walk ``headers`` within ``module``, yielding not-yet-seen nodes.
+
+        New nodes are added to the index as they are yielded, with their
+        display names obtained by calling ``transform`` on the raw segment.
+        """
+        if module != self.module:
+            self.reset(module)
+        node = self.root
+        for depth, header in enumerate(headers):
+            child = node.children.get(header)
+            if child is None:
+                child = HeaderNode(display=transform(header), depth=depth)
+                node.children[header] = child
+                yield child
+            node = child
+
+
+class SpecGroups:
+    """
+    Holds back out-of-order (e.g. xdist) results until their group completes.
+
+    A group is everything under one top level class (including nested
+    classes), or all of a module's top level test functions. Group sizes come
+    from a full list of test IDs, such as those collected by xdist workers; a
+    test counts as finished once its teardown is reported.
+    """
+
+    def __init__(self, ids, split):
+        self.split = split
+        # Collection order, for sorting each group's results on display
+        self.order = {}
+        self.sizes = Counter()
+        self.finished = Counter()
+        # Group key -> [(report, markup), ...]
+        self.pending = {}
+        for index, id_ in enumerate(ids):
+            self.order[id_] = index
+            self.sizes[self.key(id_)] += 1
+
+    def key(self, id_):
+        module, headers, _ = self.split(id_)
+        return module, headers[:1]
+
+    def add(self, report, markup):
+        """
+        Record ``report`` (displayed with ``markup``), if it's a call report.
+
+        Returns a group's entries once that group is complete, else ``None``.
+        """
+        key = self.key(report.nodeid)
+        if report.when == "call":
+            self.pending.setdefault(key, []).append((report, markup))
+        elif report.when == "teardown":
+            self.finished[key] += 1
+            if self.finished[key] >= self.sizes[key]:
+                return self.pop(key)
+
+    def pop(self, key):
+        entries = self.pending.pop(key, [])
+        entries.sort(key=lambda x: self.order.get(x[0].nodeid, -1))
+        return entries
+
+    def pop_all(self):
+        """
+        Return entries for all incomplete groups, e.g. at the end of a run.
+        """
+        entries = []
+        for key in list(self.pending):
+            entries.extend(self.pop(key))
+        entries.sort(key=lambda x: self.order.get(x[0].nodeid, -1))
+        return entries
+
+
 # NOTE: much of the high level "replace default output bits" approach is
 # cribbed directly from pytest-sugar at 0.8.0
 class RelaxedReporter(TerminalReporter):
@@ -32,10 +213,57 @@ class RelaxedReporter(TerminalReporter):
         # initial setup/cli parsing/etc. NOTE: TerminalReporter is old-style :(
         TerminalReporter.__init__(self, builtin.config)
         # Which headers have already been displayed
-        # TODO: faster data structure probably wise
-        self.headers_displayed = []
+        self.headers = HeaderIndex()
+        # Memoized test ID splitting & name transformation, shared with any
+        # other consumers in this session.
+        self.names = name_cache(self.config)
         # Size of indents. TODO: configuration
         self.indent = " " * 4
+        # Verbose output is assembled in a buffer and written out in batches;
+        # see emit() and flush_output(). Output from test code itself (-s) or
+        # debuggers must stay in order with ours, so no buffering for those.
+        self.output_buffer_size = int(
+            self.config.getini("relaxed_output_buffer_size")
+        )
+        self.direct_output = bool(
+            self.config.getoption("capture") == "no"
+            or self.config.getoption("usepdb")
+        )
+        if self.direct_output:
+            self.output_buffer_size = 0
+        self.output_flush_interval = float(
+            self.config.getini("relaxed_output_flush_interval")
+        )
+        self._pending = []
+        self._pending_size = 0
+        self._last_flush = perf_counter()
+        # Under xdist, results arrive interleaved from many workers, so they
+        # get grouped up for display; see pytest_xdist_node_collection_finished
+        self.groups = None
+        # Optional live status footer; see pytest_collection_finish and
+        # draw_progress. Off a terminal (or when tests write to it directly)
+        # it's a periodic status line instead.
+        self.progress = None
+        self.progress_footer = bool(self.isatty) and not self.direct_output
+        self.progress_interval = float(
+            self.config.getini(
+                "relaxed_progress_interval"
+                if self.progress_footer
+                else "relaxed_progress_line_interval"
+            )
+        )
+        self._last_progress = perf_counter()
+        # Footer text currently displayed, and as last rendered
+        self._footer = None
+        self._footer_text = None
+
+    def pytest_collection_finish(self, session):
+        super().pytest_collection_finish(session)
+        if self.verbosity and self.config.getoption("relaxed_progress"):
+            # NOTE: only imported when asked for, like our other extras.
+            from .progress import Progress
+
+            self.progress = Progress(len(session.items), self.spec_class)
 
     def pytest_runtest_logstart(self, nodeid, location):
         # Non-verbose: do whatever normal pytest does.
@@ -44,7 +272,14 @@ class RelaxedReporter(TerminalReporter):
                 self, nodeid, location
             )
         # Verbose: do nothing, preventing normal display of test location/id.
-        # Leaves all display up to other hooks.
+        # Leaves all display up to other hooks. (Besides getting the previous
+        # test's buffered output out the door; it mustn't sit there for the
+        # whole of a slow test.)
+        if self._pending:
+            self.flush_output()
+        if self.progress is not None:
+            self.progress.start(nodeid)
+            self.draw_progress()
 
     def pytest_runtest_logreport(self, report):
         # TODO: if we _need_ access to the test item/node itself, we may want
@@ -61,82 +296,234 @@ class RelaxedReporter(TerminalReporter):
         # tallying and whether the run failed...kind of important. (Why that's
         # not a separate hook, no idea :()
         self.update_stats(report)
+        if self.progress is not None and report.when == "teardown":
+            self.progress.finish(report.nodeid)
+            self.draw_progress()
+        # Interleaved results get held back until their whole group is done.
+        if self.groups is not None:
+            markup = (
+                self.report_markup(report) if report.when == "call" else {}
+            )
+            for report, markup in self.groups.add(report, markup) or []:
+                self.display(report, markup)
+            return
         # After that, short-circuit if it's not reporting the main call (i.e.
         # we don't want to display "the test" during its setup or teardown)
         if report.when != "call":
             return
-        id_ = report.nodeid
+        self.display(report)
+
+    @hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        # All workers collect the same tests (or xdist aborts), so the first
+        # one to report in is as good as any.
+        if self.verbosity and self.groups is None:
+            self.groups = SpecGroups(ids, self.names.split)
+            # The controller collects nothing itself.
+            if self.progress is not None and not self.progress.total:
+                self.progress.total = len(ids)
+
+    def spec_class(self, id_):
+        """
+        Return the display name of test ``id_``'s (possibly nested) class.
+        """
+        _, headers, _ = self.names.split(id_)
+        if not headers:
+            return None
+        return " > ".join(self.transform_name(x) for x in headers)
+
+    def draw_progress(self):
+        """
+        Display the progress footer, if it's due a redraw.
+
+        Status is re-rendered at most every ``relaxed_progress_interval``
+        seconds; in between, a footer erased by flushed output is simply put
+        back as it was. Without a terminal to redraw in, progress is instead
+        emitted as a plain line every ``relaxed_progress_line_interval``
+        seconds.
+        """
+        now = perf_counter()
+        due = now - self._last_progress >= self.progress_interval
+        if not self.progress_footer:
+            if due:
+                self._last_progress = now
+                self.emit("{}\n".format(self.progress.status(now)))
+            return
+        if self._footer is not None and not due:
+            return
+        self.flush_output()
+        if due or self._footer_text is None:
+            self._last_progress = now
+            # One column short of the full width, so the cursor never wraps.
+            status = self.progress.status(now)
+            self._footer_text = status[: self._tw.fullwidth - 1]
+        self._footer = self._footer_text
+        self._tw.write(self._footer, flush=True)
+
+    def flush_groups(self):
+        """
+        Display any results still held back by incomplete groups.
+        """
+        if self.groups is not None:
+            for report, markup in self.groups.pop_all():
+                self.display(report, markup)
+
+    def display(self, report, markup=None):
         # First, make sure we display non-per-test data, i.e.
         # module/class/nested class headers (which by necessity also includes
         # tracking indentation state.)
-        self.ensure_headers(id_)
+        self.ensure_headers(report.nodeid)
         # Then we can display the test name/status itself.
-        self.display_result(report)
+        self.display_result(report, markup)
 
     def update_stats(self, report):
-        cat, letter, word = self.config.hook.pytest_report_teststatus(
-            report=report, config=self.config
-        )
-        self.stats.setdefault(cat, []).append(report)
-        # For use later; apparently some other plugins can yield display markup
-        # in the 'word' field of a report.
-        self.report_word = word
+        # The same bookkeeping the default pytest_runtest_logreport does,
+        # minus its display bits.
+        category, _, _ = self.teststatus(report)
+        self._tests_ran = True
+        self._add_stats(category, [report])
+
+    def teststatus(self, report):
+        """
+        Return ``report``'s (category, letter, word) status.
+
+        Only asks the ``pytest_report_teststatus`` hook once per report,
+        caching the answer on the report itself; see also
+        `pytest_report_teststatus`.
+        """
+        status = getattr(report, "_relaxed_teststatus", None)
+        if status is None:
+            status = tuple(
+                self.config.hook.pytest_report_teststatus(
+                    report=report, config=self.config
+                )
+            )
+            report._relaxed_teststatus = status
+        return status
+
+    @hookimpl(tryfirst=True)
+    def pytest_report_teststatus(self, report, config):
+        # Later askers (eg the end of run summary) get our cached answer
+        # instead of fanning out to every plugin again. (NOTE: type checked
+        # as reports from xdist workers may carry a deserialized copy.)
+        status = getattr(report, "_relaxed_teststatus", None)
+        if isinstance(status, tuple):
+            return status
+        return None
 
     def split(self, id_):
-        # Split on pytest's :: joiner, and strip out our intermediate
-        # SpecInstance objects (appear as '()')
-        headers = [x for x in id_.split("::")[1:]]
-        # Last one is the actual test being reported on, not a header
-        leaf = headers.pop()
+        _, headers, leaf = self.names.split(id_)
         return headers, leaf
 
     def transform_name(self, name):
         """
         Take a test class/module/function name and make it human-presentable.
         """
-        # TestPrefixes / test_prefixes -> stripped
-        name = re.sub(TEST_PREFIX, "", name)
-        # TestSuffixes / suffixed_test -> stripped
-        name = re.sub(TEST_SUFFIX, "", name)
-        # All underscores become spaces, for sentence-ishness
-        name = name.replace("_", " ")
-        return name
+        return self.names.transform_name(name)
+
+    def emit(self, text, **markup):
+        """
+        Buffer ``text`` for display, flushing if any threshold was reached.
+
+        Markup is rendered immediately (so e.g. ``--color=no`` is honored
+        exactly as with direct writes); flushing then writes all pending text
+        in a single call.
+        """
+        if markup:
+            text = self._tw.markup(text, **markup)
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if (
+            self._pending_size >= self.output_buffer_size
+            or perf_counter() - self._last_flush >= self.output_flush_interval
+        ):
+            self.flush_output()
+
+    def flush_output(self):
+        """
+        Write out any buffered verbose output.
+
+        Also erases the progress footer, if one is displayed, so nothing gets
+        written after it.
+        """
+        if self._footer is not None:
+            self._tw.write("\r{}\r".format(" " * len(self._footer)))
+            self._footer = None
+        if self._pending:
+            self._tw.write("".join(self._pending), flush=True)
+            self._pending = []
+            self._pending_size = 0
+        self._last_flush = perf_counter()
+
+    # Output from anywhere else (failure summaries, live logging, other
+    # plugins, etc) must not overtake our own buffered output.
+
+    def write(self, *args, **kwargs):
+        self.flush_output()
+        return super().write(*args, **kwargs)
+
+    def write_raw(self, *args, **kwargs):
+        self.flush_output()
+        return super().write_raw(*args, **kwargs)
+
+    def write_line(self, *args, **kwargs):
+        self.flush_output()
+        return super().write_line(*args, **kwargs)
+
+    def write_sep(self, *args, **kwargs):
+        self.flush_output()
+        return super().write_sep(*args, **kwargs)
+
+    def write_ensure_prefix(self, *args, **kwargs):
+        self.flush_output()
+        return super().write_ensure_prefix(*args, **kwargs)
+
+    def line(self, *args, **kwargs):
+        self.flush_output()
+        return super().line(*args, **kwargs)
+
+    def rewrite(self, *args, **kwargs):
+        self.flush_output()
+        return super().rewrite(*args, **kwargs)
+
+    def section(self, *args, **kwargs):
+        self.flush_output()
+        return super().section(*args, **kwargs)
 
     def ensure_headers(self, id_):
-        headers, _ = self.split(id_)
+        module, headers, _ = self.names.split(id_)
+        # Module boundaries are a natural spot to flush.
+        if module != self.headers.module:
+            self.flush_output()
         printed = False
         # TODO: this works for class-based tests but needs love for module ones
         # TODO: worth displaying filename ever?
-        # Make sure we print all not-yet-seen headers
-        for i, header in enumerate(headers):
-            # Need to semi-uniq headers by their 'path'. (This is a lot like
-            # "the test id minus the last segment" but since we have to
-            # split/join either way...whatever. I like dots.)
-            header_path = ".".join(headers[: i + 1])
-            if header_path in self.headers_displayed:
-                continue
-            self.headers_displayed.append(header_path)
-            indent = self.indent * i
-            header = self.transform_name(header)
-            self._tw.write("\n{}{}\n".format(indent, header))
+        # Make sure we print all not-yet-seen headers. Headers are semi-uniq'd
+        # by their 'path' within the module, which is what the index's trie
+        # structure gives us for free.
+        for node in self.headers.visit(module, headers, self.transform_name):
+            indent = self.indent * node.depth
+            self.emit("\n{}{}\n".format(indent, node.display))
             printed = True
         # No trailing blank line after all headers; only the 'last' one (i.e.
         # before any actual test names are printed). And only if at least one
         # header was actually printed! (Otherwise one gets newlines between all
         # tests.)
         if printed:
-            self._tw.write("\n")
+            self.emit("\n")
 
-    def display_result(self, report):
+    def display_result(self, report, markup=None):
+        if markup is None:
+            markup = self.report_markup(report)
         headers, leaf = self.split(report.nodeid)
         indent = self.indent * len(headers)
         leaf = self.transform_name(leaf)
-        # This _tw.write() stuff seems to be how vanilla pytest writes its
-        # colorized verbose output. Bit clunky, but it means we automatically
+        # Markup gets rendered by our terminal writer the same way vanilla
+        # pytest writes its colorized verbose output, meaning we automatically
         # honor things like `--color=no` and whatnot.
-        self._tw.write(indent)
-        self._tw.write(leaf, **self.report_markup(report))
-        self._tw.write("\n")
+        self.emit(indent)
+        self.emit(leaf, **markup)
+        self.emit("\n")
 
     def report_markup(self, report):
         # Basically preserved from parent implementation; if something caused
@@ -144,8 +531,9 @@ class RelaxedReporter(TerminalReporter):
         # tuple. We don't care about the word (possibly bad, but it doesn't fit
         # with our display ethos right now) but the markup may be worth
         # preserving.
-        if isinstance(self.report_word, tuple):
-            return self.report_word[1]
+        word = self.teststatus(report)[2]
+        if isinstance(word, tuple):
+            return word[1]
         # Otherwise, assume ye olde pass/fail/skip.
         if report.passed:
             color = "green"
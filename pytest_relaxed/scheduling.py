@@ -0,0 +1,62 @@
+"""
+Spec-tree-aware test scheduling for ``pytest-xdist``.
+
+Only imported when xdist asks for a scheduler and ``--relaxed-dist`` is given.
+"""
+
+from collections import OrderedDict
+
+from xdist.scheduler import LoadScopeScheduling
+
+
+class SpecScopeScheduling(LoadScopeScheduling):
+    """
+    Schedule each top level spec class, and all its nested classes, as a unit.
+
+    Nested classes inherit their parents' setup (see
+    `~pytest_relaxed.classes.SpecClass`), so splitting one tree across workers
+    mostly serves to repeat that setup. Module-level test functions are
+    grouped by module, as with xdist's own ``loadscope``.
+
+    Units are handed out heaviest first, by total historical duration (see
+    `~pytest_relaxed.timings`); tests with no history count as the average of
+    those with one. Handing out the longest units first keeps the workers
+    evenly loaded towards the end of the run.
+    """
+
+    def __init__(self, config, log=None, durations=None):
+        super().__init__(config, log)
+        self.durations = durations or {}
+        # Stand-in for tests with no history; see weigh()
+        self.default_duration = (
+            sum(self.durations.values()) / len(self.durations)
+            if self.durations
+            else 1.0
+        )
+        self._weighed = False
+
+    def _split_scope(self, nodeid):
+        module, _, rest = nodeid.partition("::")
+        if "::" not in rest:
+            return module
+        return "{}::{}".format(module, rest.split("::", 1)[0])
+
+    def weigh(self, nodeids):
+        """
+        Return the expected total duration of ``nodeids``.
+        """
+        known, default = self.durations, self.default_duration
+        return sum(known.get(x, default) for x in nodeids)
+
+    def _assign_work_unit(self, node):
+        # NOTE: the work queue gets filled in and immediately handed out
+        # within schedule(), so this is the earliest point we can reorder it.
+        if not self._weighed:
+            units = sorted(
+                self.workqueue.items(),
+                key=lambda item: self.weigh(item[1]),
+                reverse=True,
+            )
+            self.workqueue = OrderedDict(units)
+            self._weighed = True
+        super()._assign_work_unit(node)
@@ -0,0 +1,24 @@
+"""
+Rules for which files & directories relaxed will collect.
+"""
+
+
+def is_private(name):
+    """
+    Whether file/directory ``name`` is marked private via Python convention.
+    """
+    return name.startswith("_")
+
+
+def is_spec_file(name):
+    """
+    Whether file ``name`` is one relaxed should collect, privacy aside.
+    """
+    return (
+        name.endswith(".py")
+        and name != "conftest.py"
+        # Also skip anything prefixed with test_; pytest's own native
+        # collection will get that stuff, and we don't _want_ to try modifying
+        # such files anyways.
+        and not name.startswith("test_")
+    )
@@ -0,0 +1,134 @@
+"""
+Per-test timing history, kept in pytest's cache between runs.
+
+Recorded only when a feature needing it (such as ``--relaxed-dist``) is in
+use. Also home to the timing-based test ordering used by ``--relaxed-order``.
+"""
+
+from pytest import StashKey, hookimpl
+
+
+KEY = "relaxed/durations"
+
+
+def load_durations(config):
+    """
+    Return ``{nodeid: seconds}`` from previous runs (or an empty dict.)
+    """
+    # NOTE: pytest's cache plugin may be disabled, eg -p no:cacheprovider.
+    cache = getattr(config, "cache", None)
+    if cache is None:
+        return {}
+    return cache.get(KEY, {})
+
+
+class DurationRecorder:
+    """
+    Totals each test's setup/call/teardown durations, saving at session end.
+
+    Results from earlier runs are retained for tests collected but not run
+    this time (e.g. deselected via ``-k``), and updated for those which were.
+    History for tests which weren't collected at all is dropped, so the cache
+    doesn't grow without bound as tests get renamed or removed.
+
+    Under xdist, collection happens on the workers; they report deselected
+    IDs back via `DeselectionForwarder`. If any worker fails to report back,
+    nothing is dropped.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.durations = {}
+        # Test IDs collected this session (by the workers, under xdist)
+        self.collected = set()
+        # xdist workers which collected, but haven't yet reported deselections
+        self.unreported = set()
+
+    def pytest_collection_finish(self, session):
+        self.collected.update(item.nodeid for item in session.items)
+
+    def pytest_deselected(self, items):
+        self.collected.update(item.nodeid for item in items)
+
+    @hookimpl(optionalhook=True)
+    def pytest_xdist_node_collection_finished(self, node, ids):
+        self.collected.update(ids)
+        self.unreported.add(node.gateway.id)
+
+    @hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        output = getattr(node, "workeroutput", None)
+        if output is not None and "relaxed_deselected" in output:
+            self.collected.update(output["relaxed_deselected"])
+            self.unreported.discard(node.gateway.id)
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] = (
+            self.durations.get(report.nodeid, 0.0) + report.duration
+        )
+
+    def pytest_sessionfinish(self):
+        cache = getattr(self.config, "cache", None)
+        if cache is None or not self.durations:
+            return
+        durations = load_durations(self.config)
+        if not self.unreported:
+            durations = {
+                nodeid: seconds
+                for nodeid, seconds in durations.items()
+                if nodeid in self.collected
+            }
+        durations.update(self.durations)
+        cache.set(KEY, durations)
+
+
+class DeselectionForwarder:
+    """
+    Sends an xdist worker's deselected test IDs to the controller.
+
+    Picked up there by `DurationRecorder`.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        # NOTE: always present, so "nothing deselected" is reported too.
+        config.workeroutput["relaxed_deselected"] = []
+
+    def pytest_deselected(self, items):
+        self.config.workeroutput["relaxed_deselected"].extend(
+            item.nodeid for item in items
+        )
+
+
+class FailFastOrder:
+    """
+    Reorders tests within a class/module for the fastest time-to-failure.
+
+    Tests which failed last time go first, then the rest, fastest first (per
+    their recorded durations; tests with no history count as instantaneous.)
+    Only test functions are moved around; nested classes keep their positions,
+    so each class' tests still run (and display) contiguously.
+    """
+
+    def __init__(self, config):
+        cache = getattr(config, "cache", None)
+        self.lastfailed = (
+            {} if cache is None else cache.get("cache/lastfailed", {})
+        )
+        self.durations = load_durations(config)
+
+    def key(self, item):
+        nodeid = item.nodeid
+        return nodeid not in self.lastfailed, self.durations.get(nodeid, 0.0)
+
+    def reorder(self, items, movable):
+        """
+        Reorder, in-place, those ``items`` for which ``movable`` is true.
+        """
+        slots = [i for i, item in enumerate(items) if movable(item)]
+        ordered = sorted((items[i] for i in slots), key=self.key)
+        for i, item in zip(slots, ordered):
+            items[i] = item
+
+
+ordering_key = StashKey[FailFastOrder]()
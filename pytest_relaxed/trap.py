@@ -9,12 +9,72 @@ Based on original code from Fabric 1.x, specifically:
 Though modifications have been made since.
 """
 
+import inspect
 import io
+import os
 import sys
-from functools import wraps
+import threading
+from contextlib import contextmanager
+from functools import partial, wraps
 
 
-class CarbonCopy(io.BytesIO):
+class StreamingLines:
+    """
+    Streaming, line-oriented view of a stream's output, via its ``watcher``.
+
+    Lets tests assert on output while it's still being produced, instead of
+    waiting to ``getvalue()`` the whole thing.
+
+    Classes using this must implement ``_start_watching``, which sets
+    ``_watcher`` to a `.capture.LineWatcher` fed with all writes from then on.
+    """
+
+    _watcher = None
+
+    @property
+    def watcher(self):
+        if self._watcher is None:
+            self._start_watching()
+        return self._watcher
+
+    def lines(self, timeout=None):
+        """
+        Iterate over output lines as they're written.
+
+        See `.capture.LineWatcher.lines`.
+        """
+        return self.watcher.lines(timeout=timeout)
+
+    def on_line(self, callback):
+        """
+        Call ``callback`` with each complete line written from now on.
+        """
+        with self.watcher.condition:
+            self.watcher.callbacks.append(callback)
+
+    def wait_for(self, pattern, timeout=None):
+        """
+        Block until a line matches ``pattern``.
+
+        See `.capture.LineWatcher.wait_for`.
+        """
+        return self.watcher.wait_for(pattern, timeout=timeout)
+
+    @property
+    def line_count(self):
+        """
+        Number of complete lines written so far.
+        """
+        return self.watcher.count
+
+    def assert_line_count(self, expected):
+        count = self.line_count
+        assert count == expected, "Expected {} lines, got {}".format(
+            expected, count
+        )
+
+
+class CarbonCopy(StreamingLines, io.BytesIO):
     """
     An IO wrapper capable of multiplexing its writes to other buffer objects.
     """
@@ -30,6 +90,8 @@ class CarbonCopy(io.BytesIO):
         elif hasattr(cc, "write"):
             cc = [cc]
         self.cc = cc
+        # Only taken once watching starts; see _start_watching.
+        self._lock = threading.RLock()
 
     def write(self, s):
         # Ensure we always write bytes.
@@ -40,6 +102,50 @@ class CarbonCopy(io.BytesIO):
         for writer in self.cc:
             writer.write(s)
 
+    def _watched_write(self, s):
+        # Like write(), but also feeding our watcher. Only used once somebody
+        # has asked to watch, so plain writes never pay for locking.
+        if isinstance(s, str):
+            s = s.encode("utf-8")
+        with self._lock:
+            super().write(s)
+            self._feed_watcher(s)
+        for writer in self.cc:
+            writer.write(s)
+
+    def _feed_watcher(self, s=b""):
+        start, end = self._watched, self.tell()
+        if end - len(s) != start:
+            # Some plain writes raced with starting to watch; catch up on
+            # everything written since then instead.
+            s = io.BytesIO.getvalue(self)[start:end]
+        if s:
+            self._watcher.feed(s)
+        self._watched = end
+
+    @property
+    def watcher(self):
+        # NOTE: always goes via _start_watching, so writes which raced with
+        # it are caught up on whenever the streaming API gets used.
+        self._start_watching()
+        return self._watcher
+
+    def _start_watching(self):
+        with self._lock:
+            if self._watcher is None:
+                from .capture import LineWatcher
+
+                watcher = LineWatcher()
+                # NOTE: swap write() out first, so that only writes already
+                # underway can slip past the seed; see _feed_watcher.
+                self.write = self._watched_write
+                value = io.BytesIO.getvalue(self)
+                self._watched = len(value)
+                watcher.seed(value.decode("utf-8"))
+                self._watcher = watcher
+            else:
+                self._feed_watcher()
+
     # Real sys.std(out|err) requires writing to a buffer attribute obj in some
     # situations.
     @property
@@ -54,27 +160,165 @@ class CarbonCopy(io.BytesIO):
         return ret
 
 
-def trap(func):
+class Capture:
+    """
+    One trapped call's replacement stdout, stderr & stdall streams.
+    """
+
+    def __init__(
+        self, chunked=False, max_bytes=None, spill_bytes=None, fd=False
+    ):
+        self.log = self.fd_capture = None
+        if chunked:
+            # NOTE: only imported when asked for; see .capture.
+            from .capture import CaptureLog, CaptureStream, FDCapture
+
+            self.log = CaptureLog(max_bytes=max_bytes, spill_bytes=spill_bytes)
+            if fd:
+                self.fd_capture = FDCapture(self.log, {1: "out", 2: "err"})
+            self.stdall = CaptureStream(
+                self.log,
+                "all",
+                view=("out", "err", "all"),
+                fd_capture=self.fd_capture,
+            )
+            self.stdout = CaptureStream(
+                self.log, "out", fd_capture=self.fd_capture
+            )
+            self.stderr = CaptureStream(
+                self.log, "err", fd_capture=self.fd_capture
+            )
+        else:
+            # Use another CarbonCopy even though we're not cc'ing; for our
+            # "write bytes, return strings" behavior. Meh.
+            self.stdall = CarbonCopy()
+            self.stdout = CarbonCopy(cc=self.stdall)
+            self.stderr = CarbonCopy(cc=self.stdall)
+
+    def close(self):
+        for stream in (self.stdout, self.stderr, self.stdall):
+            if stream._watcher is not None:
+                stream._watcher.close()
+        if self.log is not None:
+            self.log.close()
+
+
+@contextmanager
+def global_capture(capture):
+    """
+    Make ``capture``'s streams the process-wide ``sys.std(out|err|all)``.
+    """
+    if capture.fd_capture is not None:
+        # Get anything already buffered out the door before the real
+        # descriptors get swapped out from under it.
+        sys.stdout.flush()
+        sys.stderr.flush()
+    sys.stdall = capture.stdall
+    my_stdout, sys.stdout = sys.stdout, capture.stdout
+    my_stderr, sys.stderr = sys.stderr, capture.stderr
+    if capture.fd_capture is not None:
+        capture.fd_capture.start()
+    try:
+        yield capture
+    finally:
+        if capture.fd_capture is not None:
+            capture.fd_capture.stop()
+        sys.stdout = my_stdout
+        sys.stderr = my_stderr
+        del sys.stdall
+
+
+def trap(
+    func=None,
+    *,
+    chunked=False,
+    max_bytes=None,
+    spill_bytes=None,
+    fd=False,
+    local=False,
+):
     """
     Replace sys.std(out|err) with a wrapper during execution, restored after.
 
     In addition, a new combined-streams output (another wrapper) will appear at
     ``sys.stdall``. This stream will resemble what a user sees at a terminal,
     i.e. both out/err streams intermingled.
+
+    May be used bare (``@trap``) or called with options (``@trap(...)``):
+
+    - ``chunked``: record all writes once, in a single `.capture.CaptureLog`,
+      instead of copying them into a separate buffer per stream. Recommended
+      for code producing lots of output.
+    - ``max_bytes``/``spill_bytes``: bound memory use, as per
+      `.capture.CaptureLog`. Either implies ``chunked``.
+    - ``fd``: also capture output written straight to file descriptors 1 and
+      2, such as that of C extensions or subprocesses, via
+      `.capture.FDCapture`. Implies ``chunked``. POSIX only.
+
+    - ``local``: only capture output written from the current thread (and
+      context), instead of swapping out ``sys.std(out|err)`` process-wide;
+      see `.capture.local_capture`. Lets trapped functions run concurrently in
+      several threads, each seeing only its own output. Code running in other
+      threads on the trapped function's behalf is captured too, if run within a
+      copy of its context (see `contextvars.copy_context`.)
+
+    Coroutine functions are supported too, and are always captured per task,
+    so concurrently running ones don't see each other's output.
+
+    ``fd`` can't be combined with per-task or ``local`` capture, as file
+    descriptors are inherently process-wide.
     """
+    if func is None:
+        return partial(
+            trap,
+            chunked=chunked,
+            max_bytes=max_bytes,
+            spill_bytes=spill_bytes,
+            fd=fd,
+            local=local,
+        )
+    if fd and os.name != "posix":
+        raise NotImplementedError("trap(fd=True) requires a POSIX platform!")
+    is_async = inspect.iscoroutinefunction(func)
+    local = local or is_async
+    if fd and local:
+        raise ValueError("trap(fd=True) can't capture per thread or task!")
+    if local:
+        from .capture import local_capture
+
+        install = local_capture
+    else:
+        install = global_capture
+    options = dict(
+        chunked=chunked
+        or fd
+        or max_bytes is not None
+        or spill_bytes is not None,
+        max_bytes=max_bytes,
+        spill_bytes=spill_bytes,
+        fd=fd,
+    )
+
+    if is_async:
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            capture = Capture(**options)
+            try:
+                with local_capture(capture):
+                    return await func(*args, **kwargs)
+            finally:
+                capture.close()
+
+        return async_wrapper
 
     @wraps(func)
     def wrapper(*args, **kwargs):
-        # Use another CarbonCopy even though we're not cc'ing; for our "write
-        # bytes, return strings" behavior. Meh.
-        sys.stdall = CarbonCopy()
-        my_stdout, sys.stdout = sys.stdout, CarbonCopy(cc=sys.stdall)
-        my_stderr, sys.stderr = sys.stderr, CarbonCopy(cc=sys.stdall)
+        capture = Capture(**options)
         try:
-            return func(*args, **kwargs)
+            with install(capture):
+                return func(*args, **kwargs)
         finally:
-            sys.stdout = my_stdout
-            sys.stderr = my_stderr
-            del sys.stdall
+            capture.close()
 
     return wrapper
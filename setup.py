@@ -29,7 +29,7 @@ setup(
         # TODO: do we need to name the LHS 'pytest_relaxed' too? meh
         "pytest11": ["relaxed = pytest_relaxed.plugin"]
     },
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=[
         # Difficult to support Pytest<7 + Pytest>=7 at same time, and
         # pytest-relaxed never supported pytests 5 or 6, so...why bother!
@@ -48,7 +48,6 @@ setup(
         "Programming Language :: Python",
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3 :: Only",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -64,5 +64,22 @@ def test(
     )
 
 
-ns = Collection(checks.blacken, checks, coverage, docs, test, release)
+@task
+def benchmark(c, name=None, compare=None, opts=""):
+    """
+    Run the benchmark suite, saving results under ``name`` (default: version).
+
+    Use ``compare`` to compare against earlier saved results; see
+    ``benchmarks/suite.py --help`` for other options, passable via ``opts``.
+    """
+    if name:
+        opts += " --name={}".format(name)
+    if compare:
+        opts += " --compare={}".format(compare)
+    c.run("python benchmarks/suite.py {}".format(opts))
+
+
+ns = Collection(
+    checks.blacken, checks, coverage, docs, test, benchmark, release
+)
 ns.configure({"blacken": {"find_opts": "-and -not -path './build*'"}})
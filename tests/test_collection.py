@@ -1,6 +1,10 @@
+import json
 import re
+from types import SimpleNamespace
 
-from pytest import ExitCode, mark
+from pytest import ExitCode, Stash, importorskip, mark
+
+from pytest_relaxed.classes import cached_inheritance_plan
 
 
 # For 'testdir' fixture, mostly
@@ -84,6 +88,100 @@ class Test_pytest_collect_file:
         assert "actual_tests.py" in stdout
         assert "conftest.py" not in stdout
 
+    def test_collects_files_created_during_collection(self, testdir):
+        testdir.mkdir("sub")
+        testdir.makepyfile(
+            **{
+                "sub/conftest": """
+                import os
+
+                here = os.path.dirname(__file__)
+                with open(os.path.join(here, "generated.py"), "w") as fd:
+                    fd.write("def gen_test():\\n    pass\\n")
+            """
+            }
+        )
+        testdir.runpytest().assert_outcomes(passed=1)
+
+
+class TestCollectionProfiling:
+    def _makefile(self, testdir):
+        testdir.makepyfile(
+            foo="""
+            class Outer:
+                def outer_test(self):
+                    pass
+
+                class Inner:
+                    def inner_test(self):
+                        pass
+        """
+        )
+
+    def test_off_by_default(self, testdir):
+        self._makefile(testdir)
+        stdout = testdir.runpytest().stdout.str()
+        assert "relaxed collection profile" not in stdout
+
+    def test_displays_table_when_enabled(self, testdir):
+        self._makefile(testdir)
+        result = testdir.runpytest("--relaxed-profile-collection")
+        result.stdout.fnmatch_lines(
+            [
+                "*relaxed collection profile*",
+                "*seconds*calls*operation*depth*module*",
+                "* 1 *SpecModule.collect * 0 *foo.py",
+            ]
+        )
+        stdout = result.stdout.str()
+        # Nested classes are reported at their own depth
+        assert re.search(r"SpecClass.collect +2 +foo.py", stdout)
+
+    def test_table_can_be_truncated(self, testdir):
+        self._makefile(testdir)
+        result = testdir.runpytest(
+            "--relaxed-profile-collection", "--relaxed-profile-top=1"
+        )
+        lines = result.stdout.str().splitlines()
+        title = [x for x in lines if "collection profile" in x][0]
+        # Title, column headers, the one row, then the final summary line.
+        assert len(lines) - lines.index(title) == 4
+
+    def test_can_write_json(self, testdir):
+        self._makefile(testdir)
+        path = testdir.tmpdir.join("profile.json")
+        testdir.runpytest(
+            "--relaxed-profile-collection",
+            "--relaxed-profile-json={}".format(path),
+        )
+        rows = json.loads(path.read())
+        operations = {x["operation"] for x in rows}
+        assert "SpecModule.collect" in operations
+        assert "SpecClass._getobj" in operations
+        assert set(rows[0]) == {
+            "operation",
+            "module",
+            "depth",
+            "calls",
+            "seconds",
+        }
+
+    def test_merges_worker_profiles_under_xdist(self, testdir):
+        importorskip("xdist")
+        self._makefile(testdir)
+        path = testdir.tmpdir.join("profile.json")
+        result = testdir.runpytest_subprocess(
+            "-n",
+            "2",
+            "--relaxed-profile-collection",
+            "--relaxed-profile-json={}".format(path),
+        )
+        # Both workers collected the module once each.
+        result.stdout.fnmatch_lines(["* 2 *SpecModule.collect * 0 *foo.py"])
+        rows = json.loads(path.read())
+        collects = [x for x in rows if x["operation"] == "SpecModule.collect"]
+        assert [x["calls"] for x in collects] == [2]
+
 
 class TestRelaxedMixin:
     def test_selects_all_non_underscored_members(self, testdir):
@@ -476,3 +574,178 @@ class TestSpecClass:
         """
         )
         assert testdir.runpytest().ret is ExitCode.OK
+
+    def test_nested_classes_are_built_lazily(self, testdir):
+        testdir.makeconftest(
+            """
+            def pytest_sessionfinish(session):
+                import foo
+
+                with open("decorated.txt", "w") as fd:
+                    fd.write(str(hasattr(foo.Outer.Other, "an_attr")))
+        """
+        )
+        testdir.makepyfile(
+            foo="""
+            class Outer:
+                an_attr = 5
+
+                class Inner:
+                    def inner_test(self):
+                        assert self.an_attr == 5
+
+                class Other:
+                    def other_test(self):
+                        pass
+        """
+        )
+        decorated = testdir.tmpdir.join("decorated.txt")
+        # Selecting one nested class by ID never touches its sibling
+        testdir.runpytest("foo.py::Outer::Inner").assert_outcomes(passed=1)
+        assert decorated.read() == "False"
+        # But -k requires collecting everything, so in that case it does
+        testdir.runpytest("-k", "inner_test").assert_outcomes(passed=1)
+        assert decorated.read() == "True"
+
+    def test_inheritance_plans_are_computed_once_per_class_pair(self):
+        class Outer:
+            an_attr = 5
+
+            def setup_method(self):
+                pass
+
+            def outer_test(self):
+                pass
+
+            class Inner:
+                an_attr = 7
+
+        config = SimpleNamespace(stash=Stash())
+        plan = cached_inheritance_plan(config, Outer, Outer.Inner)
+        assert plan == ("setup_method",)
+        # Applying the plan alters the child's dir(), but asking again still
+        # hands back the original plan.
+        for name in plan:
+            setattr(Outer.Inner, name, getattr(Outer, name))
+        assert cached_inheritance_plan(config, Outer, Outer.Inner) is plan
+        # Other sessions start from scratch.
+        other = SimpleNamespace(stash=Stash())
+        assert cached_inheritance_plan(other, Outer, Outer.Inner) == ()
+
+
+class TestSharedSetup:
+    def _spec(self, testdir, marker):
+        testdir.makepyfile(
+            foo="""
+            import pytest
+
+            calls = []
+
+            {}
+            class Outer:
+                def setup_method(self):
+                    calls.append("setup")
+                    self.conn = object()
+                    self.items = []
+
+                def teardown_method(self):
+                    calls.append("teardown")
+
+                def outer_test(self):
+                    self.items.append(1)
+                    assert calls == ["setup"]
+
+                class Inner:
+                    def setup_method(self):
+                        self.per_test = True
+
+                    def inner_test(self):
+                        assert self.per_test
+                        assert calls == ["setup"]
+                        assert self.items == [1]
+
+                    class Deeper:
+                        def deeper_test(self):
+                            assert calls == ["setup"]
+
+            def after_test():
+                assert calls == ["setup", "teardown"]
+        """.format(
+                marker
+            )
+        )
+
+    def test_marker_runs_setup_once_for_subtree(self, testdir):
+        self._spec(testdir, "@pytest.mark.relaxed_shared")
+        testdir.runpytest("--strict-markers").assert_outcomes(passed=4)
+
+    def test_class_attribute_also_works(self, testdir):
+        self._spec(testdir, "")
+        foo = testdir.tmpdir.join("foo.py")
+        foo.write(
+            foo.read().replace(
+                "class Outer:\n", "class Outer:\n    relaxed_shared = True\n"
+            )
+        )
+        testdir.runpytest().assert_outcomes(passed=4)
+
+    def test_teardown_follows_last_selected_test(self, testdir):
+        self._spec(testdir, "@pytest.mark.relaxed_shared")
+        result = testdir.runpytest("-k", "outer_test or after_test")
+        result.assert_outcomes(passed=2)
+
+    def test_class_is_restored_afterwards(self, testdir):
+        self._spec(testdir, "@pytest.mark.relaxed_shared")
+        testdir.makeconftest(
+            """
+            import sys
+
+            def pytest_unconfigure():
+                Outer = sys.modules["foo"].Outer
+                with open("restored.txt", "w") as fd:
+                    fd.write(repr([
+                        Outer.setup_method.__name__,
+                        Outer.teardown_method.__name__,
+                        "setup_method" in Outer.Inner.__dict__,
+                        hasattr(Outer, "_relaxed_shared_state"),
+                    ]))
+        """
+        )
+        testdir.runpytest().assert_outcomes(passed=4)
+        restored = testdir.tmpdir.join("restored.txt").read()
+        assert restored == repr(
+            ["setup_method", "teardown_method", True, False]
+        )
+
+    def test_only_shared_classes_use_the_fixture(self, testdir):
+        self._spec(testdir, "@pytest.mark.relaxed_shared")
+        testdir.makeconftest(
+            """
+            def pytest_runtest_setup(item):
+                if "_relaxed_shared_scope" in item.fixturenames:
+                    with open("users.txt", "a") as fd:
+                        fd.write(item.name + "\\n")
+        """
+        )
+        testdir.runpytest().assert_outcomes(passed=4)
+        users = testdir.tmpdir.join("users.txt").read().split()
+        assert users == ["outer_test", "inner_test", "deeper_test"]
+
+    def test_setup_runs_per_test_when_unmarked(self, testdir):
+        testdir.makepyfile(
+            foo="""
+            calls = []
+
+            class Outer:
+                def setup_method(self):
+                    calls.append("setup")
+
+                def outer_test(self):
+                    assert calls == ["setup"]
+
+                class Inner:
+                    def inner_test(self):
+                        assert len(calls) > 1
+        """
+        )
+        testdir.runpytest().assert_outcomes(passed=2)
@@ -1,14 +1,11 @@
-from pytest import skip
+import json
+
+from pytest import importorskip, skip
 
 # Load some fixtures we expose, without actually loading our entire plugin
 from pytest_relaxed.fixtures import environ  # noqa
 
 
-# TODO: how best to make all of this opt-in/out? Reporter as separate plugin?
-# (May not be feasible if it has to assume something about how our collection
-# works?) CLI option (99% sure we can hook into that as a plugin)?
-
-
 def _expect_regular_output(testdir):
     output = testdir.runpytest().stdout.str()
     # Regular results w/ status letters
@@ -274,6 +271,32 @@ Behaviors
 """.lstrip()
         assert expected in testdir.runpytest("-v").stdout.str()
 
+    def test_same_named_classes_in_different_modules_get_headers(
+        self, testdir
+    ):
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+            """,
+            other_behaviors="""
+                class Behaviors:
+                    def behavior_two(self):
+                        pass
+            """,
+        )
+        expected = """
+Behaviors
+
+    behavior one
+
+Behaviors
+
+    behavior two
+""".lstrip()
+        assert expected in testdir.runpytest("-v").stdout.str()
+
     def test_headers_and_tests_have_underscores_turn_to_spaces(self, testdir):
         testdir.makepyfile(
             behaviors="""
@@ -322,6 +345,411 @@ Stuff
         assert expected in testdir.runpytest("-v").stdout.str()
 
 
+class TestBufferedOutput:
+    def _makefile(self, testdir):
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        print("one")
+
+                    def behavior_two(self):
+                        print("two")
+                        assert False
+            """
+        )
+
+    def test_results_are_flushed_before_summary(self, testdir):
+        self._makefile(testdir)
+        output = testdir.runpytest_subprocess("-v").stdout.str()
+        results = """
+Behaviors
+
+    behavior one
+    behavior two
+""".lstrip()
+        assert results in output
+        assert output.index(results) < output.index("== FAILURES ==")
+
+    def test_matches_unbuffered_output(self, testdir):
+        self._makefile(testdir)
+        buffered = testdir.runpytest_subprocess("-v").stdout.str()
+        unbuffered = testdir.runpytest_subprocess(
+            "-v", "-o", "relaxed_output_buffer_size=0"
+        ).stdout.str()
+        # Everything before the tracebacks (which contain memory addresses)
+        # should be identical.
+        marker = "== FAILURES =="
+        assert buffered.split(marker)[0] == unbuffered.split(marker)[0]
+
+    def test_nothing_is_held_back_while_a_test_runs(self, testdir):
+        self._makefile(testdir)
+        testdir.makeconftest(
+            """
+            def pytest_runtest_call(item):
+                reporter = item.config.pluginmanager.getplugin(
+                    "terminalreporter"
+                )
+                with open("pending.txt", "a") as fd:
+                    fd.write("{}\\n".format(len(reporter._pending)))
+        """
+        )
+        testdir.runpytest(
+            "-v", "-o", "relaxed_output_flush_interval=60"
+        ).assert_outcomes(passed=1, failed=1)
+        assert testdir.tmpdir.join("pending.txt").read() == "0\n0\n"
+
+    def test_uncaptured_test_output_stays_in_order(self, testdir):
+        self._makefile(testdir)
+        output = testdir.runpytest_subprocess(
+            "-v", "-s", "-o", "relaxed_output_flush_interval=60"
+        ).stdout.str()
+        expected = """
+one
+
+Behaviors
+
+    behavior one
+two
+    behavior two
+""".lstrip()
+        assert expected in output
+
+
+class TestVerboseDistributed:
+    def test_groups_interleaved_results_by_top_level_class(self, testdir):
+        importorskip("xdist")
+        names = ("Alpha", "Beta", "Gamma", "Delta")
+        template = """
+class {}:
+    def behavior_one(self):
+        pass
+
+    def behavior_two(self):
+        pass
+
+    class Nested:
+        def behavior_three(self):
+            pass
+"""
+        testdir.makepyfile(
+            behaviors="".join(template.format(x) for x in names)
+        )
+        output = testdir.runpytest_subprocess("-v", "-n", "4").stdout.str()
+        expected = """
+{}
+
+    behavior one
+    behavior two
+
+    Nested
+
+        behavior three
+"""
+        for name in names:
+            assert expected.format(name) in output
+        assert "12 passed" in output
+
+
+class TestProgress:
+    def _makefile(self, testdir):
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+
+                    class Nested:
+                        def behavior_two(self):
+                            pass
+            """
+        )
+
+    def test_not_displayed_by_default(self, testdir):
+        self._makefile(testdir)
+        output = testdir.runpytest("-v").stdout.str()
+        assert "tests/s" not in output
+
+    def test_emits_status_lines_when_not_a_terminal(self, testdir):
+        self._makefile(testdir)
+        output = testdir.runpytest(
+            "-v",
+            "--relaxed-progress",
+            "-o",
+            "relaxed_progress_line_interval=0",
+        ).stdout.str()
+        assert "[0/2 0%] 0.0 tests/s slowest: Behaviors (" in output
+        assert "[1/2 50%] " in output
+        assert "slowest: Behaviors > Nested (" in output
+        assert "[2/2 100%] " in output
+        assert " ETA " in output
+
+    def test_line_interval_limits_status_lines(self, testdir):
+        self._makefile(testdir)
+        output = testdir.runpytest("-v", "--relaxed-progress").stdout.str()
+        assert "tests/s" not in output
+        assert "    behavior one" in output
+
+    def test_status(self):
+        from pytest_relaxed.progress import Progress
+
+        progress = Progress(4, lambda id_: id_.upper())
+        progress.started = 0
+        progress.start("a", now=0)
+        progress.start("b", now=1)
+        progress.finish("a")
+        assert (
+            progress.status(now=2)
+            == "[1/4 25%] 0.5 tests/s ETA 6.0s slowest: B (1.0s)"
+        )
+
+
+class TestJSONLReport:
+    def test_streams_one_record_per_test(self, testdir):
+        testdir.makeconftest(
+            """
+                from pytest import fixture, skip
+
+                @fixture
+                def skipper():
+                    skip()
+            """
+        )
+        testdir.makepyfile(
+            behaviors="""
+                def TestTopLevel():
+                    pass
+
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+
+                    class Nested_Things:
+                        def test_fails(self):
+                            assert False
+
+                        def skips_in_setup(self, skipper):
+                            pass
+            """
+        )
+        path = testdir.tmpdir.join("report.jsonl")
+        testdir.runpytest("--relaxed-report-jsonl={}".format(path))
+        records = [json.loads(x) for x in path.readlines()]
+        assert [x["nodeid"] for x in records] == [
+            "behaviors.py::TestTopLevel",
+            "behaviors.py::Behaviors::behavior_one",
+            "behaviors.py::Behaviors::Nested_Things::test_fails",
+            "behaviors.py::Behaviors::Nested_Things::skips_in_setup",
+        ]
+        top, one, fails, skips = records
+        assert top["headers"] == []
+        assert top["name"] == "TopLevel"
+        assert top["depth"] == 0
+        assert top["module"] == "behaviors.py"
+        assert one["headers"] == ["Behaviors"]
+        assert one["name"] == "behavior one"
+        assert one["outcome"] == "passed"
+        assert fails["headers"] == ["Behaviors", "Nested Things"]
+        assert fails["name"] == "fails"
+        assert fails["depth"] == 2
+        assert fails["outcome"] == "failed"
+        assert fails["when"] == "call"
+        assert skips["outcome"] == "skipped"
+        assert skips["when"] == "setup"
+        assert isinstance(one["duration"], float)
+
+    def test_not_written_by_default(self, testdir):
+        testdir.makepyfile(
+            behaviors="""
+                def behavior_one():
+                    pass
+            """
+        )
+        testdir.runpytest()
+        assert not testdir.tmpdir.join("report.jsonl").exists()
+
+
+class TestNameCache:
+    def test_stats_not_displayed_by_default(self, testdir):
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+            """
+        )
+        output = testdir.runpytest("-v").stdout.str()
+        assert "relaxed name cache" not in output
+
+    def test_stats_displayed_when_configured(self, testdir):
+        testdir.makeini(
+            """
+            [pytest]
+            relaxed_name_cache_stats = true
+        """
+        )
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+
+                    def behavior_two(self):
+                        pass
+            """
+        )
+        output = testdir.runpytest("-v").stdout.str()
+        assert "relaxed name cache" in output
+        # One miss apiece for the header & two leaf names; the header only
+        # gets transformed once, as it's only displayed once.
+        assert "transform_name: 0 hits, 3 misses" in output
+        # Each report splits its test ID twice
+        assert "split: 2 hits, 2 misses" in output
+
+    def test_size_is_configurable(self, testdir):
+        testdir.makeini(
+            """
+            [pytest]
+            relaxed_name_cache_stats = true
+            relaxed_name_cache_size = 1
+        """
+        )
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+
+                    def behavior_two(self):
+                        pass
+            """
+        )
+        output = testdir.runpytest("-v").stdout.str()
+        assert "transform_name: 0 hits, 3 misses, 1/1 entries" in output
+
+
+class TestTestStatus:
+    def test_hook_is_dispatched_once_per_report(self, testdir):
+        testdir.makeconftest(
+            """
+            import json
+            from collections import Counter
+
+            calls = Counter()
+
+            # Stands in for any other plugin implementing the hook.
+            def pytest_report_teststatus(report):
+                calls["{}:{}".format(report.nodeid, report.when)] += 1
+
+            def pytest_unconfigure():
+                with open("calls.json", "w") as fd:
+                    json.dump(calls, fd)
+        """
+        )
+        testdir.makepyfile(
+            behaviors="""
+                import pytest
+
+                class Behaviors:
+                    def passes(self):
+                        pass
+
+                    def fails(self):
+                        assert False
+
+                    def skips(self):
+                        pytest.skip()
+            """
+        )
+        # -rA makes the summary ask about every report all over again.
+        result = testdir.runpytest("-v", "-rA")
+        result.assert_outcomes(passed=1, failed=1, skipped=1)
+        calls = json.loads(testdir.tmpdir.join("calls.json").read())
+        assert len(calls) == 9
+        assert set(calls.values()) == {1}
+        # And the stats still add up.
+        assert "1 failed, 1 passed, 1 skipped" in result.stdout.str()
+
+
+class TestReporterSelection:
+    def _setup(self, testdir):
+        # Record which reporter ended up in charge.
+        testdir.makeconftest(
+            """
+            def pytest_sessionfinish(session):
+                plugin = session.config.pluginmanager.getplugin(
+                    "terminalreporter"
+                )
+                with open("reporter.txt", "w") as fd:
+                    fd.write(type(plugin).__name__)
+        """
+        )
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+            """
+        )
+        return testdir.tmpdir.join("reporter.txt")
+
+    def test_auto_installs_in_verbose_mode(self, testdir):
+        reporter = self._setup(testdir)
+        output = testdir.runpytest("-v").stdout.str()
+        assert reporter.read() == "RelaxedReporter"
+        assert "    behavior one" in output
+
+    def test_auto_skips_non_verbose_runs(self, testdir):
+        reporter = self._setup(testdir)
+        testdir.runpytest().assert_outcomes(passed=1)
+        assert reporter.read() == "TerminalReporter"
+
+    def test_off_never_installs(self, testdir):
+        reporter = self._setup(testdir)
+        output = testdir.runpytest("-v", "--relaxed-reporter=off").stdout.str()
+        assert reporter.read() == "TerminalReporter"
+        assert "behaviors.py::Behaviors::behavior_one PASSED" in output
+
+    def test_on_always_installs(self, testdir):
+        reporter = self._setup(testdir)
+        testdir.runpytest("--relaxed-reporter=on").assert_outcomes(passed=1)
+        assert reporter.read() == "RelaxedReporter"
+
+    def test_no_terminal_plugin_is_fine(self, testdir):
+        reporter = self._setup(testdir)
+        result = testdir.runpytest(
+            "-p", "no:terminal", "--relaxed-reporter=on"
+        )
+        assert result.ret == 0
+        assert reporter.read() == "NoneType"
+
+    def test_auto_skips_xdist_workers(self, testdir):
+        importorskip("xdist")
+        testdir.makeconftest(
+            """
+            import os
+
+            def pytest_sessionfinish(session):
+                config = session.config
+                if hasattr(config, "workerinput"):
+                    plugin = config.pluginmanager.getplugin(
+                        "terminalreporter"
+                    )
+                    with open("worker.txt", "w") as fd:
+                        fd.write(type(plugin).__name__)
+        """
+        )
+        testdir.makepyfile(
+            behaviors="""
+                class Behaviors:
+                    def behavior_one(self):
+                        pass
+            """
+        )
+        testdir.runpytest("-v", "-n", "1").assert_outcomes(passed=1)
+        assert testdir.tmpdir.join("worker.txt").read() == "TerminalReporter"
+
+
 class TestNormalMixed:
     """
     Mixed function and class test modules, normal display mode.
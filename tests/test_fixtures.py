@@ -0,0 +1,246 @@
+import os
+import subprocess
+import sys
+
+from pytest_relaxed.fixtures import (  # noqa
+    EnvironRecorder,
+    EnvironSnapshot,
+    EnvironTracker,
+    environ,
+)
+
+
+class TestEnvironTracker:
+    def test_changes_apply_to_wrapped_mapping(self):
+        env = {"A": "1"}
+        tracker = EnvironTracker(env)
+        tracker["B"] = "2"
+        del tracker["A"]
+        assert env == {"B": "2"}
+        assert dict(tracker) == env
+
+    def test_restore_undoes_sets_adds_and_deletes(self):
+        env = {"A": "1", "B": "2", "C": "3"}
+        tracker = EnvironTracker(env)
+        tracker["A"] = "changed"
+        tracker["A"] = "changed again"
+        tracker["D"] = "new"
+        del tracker["B"]
+        tracker.pop("C")
+        tracker.restore()
+        assert env == {"A": "1", "B": "2", "C": "3"}
+
+    def test_only_touched_keys_are_recorded(self):
+        env = {str(x): "x" for x in range(1000)}
+        tracker = EnvironTracker(env)
+        tracker.update({"5": "y", "6": "z"})
+        assert tracker.originals == {"5": "x", "6": "x"}
+
+    def test_deleting_missing_keys_raises_without_recording(self):
+        tracker = EnvironTracker({})
+        try:
+            del tracker["nope"]
+        except KeyError:
+            pass
+        else:
+            assert False, "Did not raise KeyError!"
+        assert tracker.originals == {}
+
+
+class TestEnvironSnapshot:
+    def test_restore_undoes_sets_adds_and_deletes(self):
+        env = {"A": "1", "B": "2", "C": "3"}
+        snapshot = EnvironSnapshot(env)
+        env["A"] = "changed"
+        env["D"] = "new"
+        del env["B"]
+        snapshot.restore()
+        assert env == {"A": "1", "B": "2", "C": "3"}
+
+    def test_restores_in_place(self):
+        env = {"A": "1"}
+        snapshot = EnvironSnapshot(env)
+        env.clear()
+        snapshot.restore()
+        assert snapshot.environ is env
+        assert env == {"A": "1"}
+
+
+class TestEnvironRecorder:
+    def test_records_direct_changes_and_restores_them(self):
+        os.environ["PYTEST_RELAXED_KEPT"] = "original"
+        os.environ.pop("PYTEST_RELAXED_NEW", None)
+        recorder = EnvironRecorder()
+        recorder.start()
+        try:
+            os.environ["PYTEST_RELAXED_KEPT"] = "changed"
+            os.environ["PYTEST_RELAXED_KEPT"] = "changed again"
+            os.environ.update(PYTEST_RELAXED_NEW="new")
+            assert sorted(recorder.originals) == [
+                "PYTEST_RELAXED_KEPT",
+                "PYTEST_RELAXED_NEW",
+            ]
+            assert recorder.originals["PYTEST_RELAXED_KEPT"] == "original"
+        finally:
+            recorder.restore()
+        assert os.environ["PYTEST_RELAXED_KEPT"] == "original"
+        assert "PYTEST_RELAXED_NEW" not in os.environ
+        del os.environ["PYTEST_RELAXED_KEPT"]
+
+    def test_keeps_os_environ_identity_and_type(self):
+        original = os.environ
+        recorder = EnvironRecorder()
+        recorder.start()
+        assert os.environ is original
+        assert isinstance(os.environ, os._Environ)
+        recorder.restore()
+        assert type(os.environ) is os._Environ
+
+
+class Test_environ:
+    def test_yields_real_os_environ(self, environ):  # noqa: F811
+        assert environ is os.environ
+
+    def test_changes_are_seen_by_subprocesses(self, environ):  # noqa: F811
+        environ["PYTEST_RELAXED_ENVIRON_TEST"] = "yup"
+        code = "import os; print(os.environ['PYTEST_RELAXED_ENVIRON_TEST'])"
+        out = subprocess.check_output([sys.executable, "-c", code])
+        assert out.decode().strip() == "yup"
+
+    def test_restores_after_test(self, testdir):
+        testdir.makeconftest(
+            """
+            from pytest_relaxed.fixtures import environ
+        """
+        )
+        testdir.makepyfile(
+            test_env="""
+            import os
+
+            ORIGINAL = os.environ
+
+            def test_first(environ):
+                environ["PYTEST_RELAXED_ADDED"] = "yes"
+                environ["HOME"] = "/nowhere"
+                del environ["PATH"]
+                # Changes made directly (eg by code under test) count too
+                os.environ["PYTEST_RELAXED_DIRECT"] = "yes"
+
+            def test_second():
+                assert "PYTEST_RELAXED_ADDED" not in os.environ
+                assert "PYTEST_RELAXED_DIRECT" not in os.environ
+                assert os.environ["HOME"] != "/nowhere"
+                assert "PATH" in os.environ
+                assert os.environ is ORIGINAL
+        """
+        )
+        testdir.runpytest("-p", "no:relaxed").assert_outcomes(passed=2)
+
+
+class TestScopedEnviron:
+    def test_layers_stack_across_nested_classes(self, testdir):
+        testdir.makeconftest(
+            """
+            import pytest
+
+            @pytest.fixture(autouse=True)
+            def module_env(request, module_environ):
+                module_environ["MODULE"] = request.module.__name__
+        """
+        )
+        testdir.makepyfile(
+            foo="""
+            import os
+
+            class Outer:
+                def outer_test(self, class_environ):
+                    class_environ["SCOPE"] = "Outer"
+                    class_environ["OUTER"] = "yes"
+
+                class Inner:
+                    def inner_test(self, class_environ):
+                        assert os.environ["SCOPE"] == "Outer"
+                        class_environ["SCOPE"] = "Inner"
+
+                    def later_inner_test(self):
+                        assert os.environ["SCOPE"] == "Inner"
+                        assert os.environ["MODULE"] == "foo"
+
+                def later_outer_test(self):
+                    assert os.environ["SCOPE"] == "Outer"
+                    assert os.environ["OUTER"] == "yes"
+
+            def module_level_test(class_environ):
+                assert "SCOPE" not in os.environ
+                assert "OUTER" not in os.environ
+                class_environ["MODULE_LEVEL"] = "yes"
+
+            def later_module_level_test():
+                assert os.environ["MODULE_LEVEL"] == "yes"
+        """,
+            bar="""
+            import os
+
+            def other_module_test(session_environ):
+                assert os.environ["MODULE"] == "bar"
+                session_environ["SESSION"] = "yes"
+
+            def later_test():
+                assert os.environ["SESSION"] == "yes"
+        """,
+        )
+        result = testdir.runpytest("bar.py", "foo.py")
+        result.assert_outcomes(passed=8)
+        # And nothing leaked into the (in-process) test session.
+        assert "SESSION" not in os.environ
+        assert "MODULE" not in os.environ
+        assert "MODULE_LEVEL" not in os.environ
+
+    def test_outer_layers_record_values_from_before_inner_changes(
+        self, testdir
+    ):
+        testdir.makepyfile(
+            foo="""
+            import os
+
+            class Outer:
+                def sets_class_then_module(
+                    self, class_environ, module_environ
+                ):
+                    class_environ["LEAKY"] = "class"
+                    module_environ["LEAKY"] = "module"
+
+                def sees_module_value(self):
+                    assert os.environ["LEAKY"] == "module"
+
+            def sees_module_value_after_class(class_environ):
+                assert os.environ["LEAKY"] == "module"
+        """,
+            zzz="""
+            import os
+
+            def nothing_leaked():
+                assert "LEAKY" not in os.environ
+        """,
+        )
+        testdir.runpytest("foo.py", "zzz.py").assert_outcomes(passed=4)
+
+    def test_layer_changes_survive_environ_fixture(self, testdir):
+        testdir.makepyfile(
+            foo="""
+            import os
+
+            class Outer:
+                def sets_both(self, environ, class_environ):
+                    environ["DIRECT"] = "yes"
+                    class_environ["CLASS"] = "yes"
+
+                def sees_only_class_value(self):
+                    assert os.environ["CLASS"] == "yes"
+                    assert "DIRECT" not in os.environ
+
+            def nothing_leaked():
+                assert "CLASS" not in os.environ
+        """
+        )
+        testdir.runpytest().assert_outcomes(passed=3)
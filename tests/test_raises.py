@@ -1,3 +1,6 @@
+import asyncio
+import inspect
+
 import pytest
 
 from pytest_relaxed import raises
@@ -40,3 +43,29 @@ class Test_raises:
         with pytest.raises(OtherBoom) as exc:
             kaboom()
         assert "sup" == str(exc.value)
+
+    def test_awaits_coroutine_functions(self):
+        @raises(Boom)
+        async def kaboom():
+            await asyncio.sleep(0)
+            raise Boom
+
+        assert inspect.iscoroutinefunction(kaboom)
+        asyncio.run(kaboom())
+
+    def test_coroutines_not_raising_fail(self):
+        @raises(Boom)
+        async def kaboom():
+            await asyncio.sleep(0)
+
+        with pytest.raises(Exception) as exc:
+            asyncio.run(kaboom())
+        assert "Did not receive expected Boom!" in str(exc.value)
+
+    def test_coroutine_signatures_are_preserved(self):
+        @raises(Boom)
+        async def kaboom(self, environ, other=1):
+            raise Boom
+
+        assert str(inspect.signature(kaboom)) == "(self, environ, other=1)"
+        assert kaboom.__name__ == "kaboom"
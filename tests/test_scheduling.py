@@ -0,0 +1,131 @@
+import json
+
+from pytest import importorskip
+
+
+class TestSpecScopeScheduling:
+    def test_keeps_spec_trees_on_one_worker(self, testdir):
+        importorskip("xdist")
+        testdir.makeconftest(
+            """
+            import json, os
+
+            def pytest_runtest_setup(item):
+                with open("workers.jsonl", "a") as fd:
+                    worker = os.environ["PYTEST_XDIST_WORKER"]
+                    fd.write(json.dumps([item.nodeid, worker]) + "\\n")
+        """
+        )
+        template = """
+class {}:
+    def behavior_one(self):
+        pass
+
+    def behavior_two(self):
+        pass
+
+    class Nested:
+        def behavior_three(self):
+            pass
+
+        class Deeper:
+            def behavior_four(self):
+                pass
+"""
+        names = ("Alpha", "Beta", "Gamma", "Delta", "Epsilon", "Zeta")
+        testdir.makepyfile(
+            behaviors="".join(template.format(x) for x in names)
+        )
+        result = testdir.runpytest_subprocess("-n", "3", "--relaxed-dist")
+        result.assert_outcomes(passed=24)
+        workers = {}
+        for line in testdir.tmpdir.join("workers.jsonl").readlines():
+            nodeid, worker = json.loads(line)
+            top = nodeid.split("::")[1]
+            workers.setdefault(top, set()).add(worker)
+        assert sorted(workers) == sorted(names)
+        for top, used in workers.items():
+            assert len(used) == 1, "{} ran on {}".format(top, used)
+
+    def test_records_durations_for_later_runs(self, testdir):
+        importorskip("xdist")
+        testdir.makepyfile(
+            behaviors="""
+            class Behaviors:
+                def behavior_one(self):
+                    pass
+        """
+        )
+        testdir.runpytest_subprocess("-n", "2", "--relaxed-dist")
+        path = testdir.tmpdir.join(".pytest_cache/v/relaxed/durations")
+        durations = json.loads(path.read())
+        assert list(durations) == ["behaviors.py::Behaviors::behavior_one"]
+
+    def test_forgets_durations_of_tests_no_longer_collected(self, testdir):
+        importorskip("xdist")
+        testdir.makepyfile(
+            behaviors="""
+            class Behaviors:
+                def behavior_one(self):
+                    pass
+
+                def behavior_two(self):
+                    pass
+        """
+        )
+        testdir.runpytest_subprocess("-n", "2", "--relaxed-dist")
+        testdir.makepyfile(
+            behaviors="""
+            class Behaviors:
+                def behavior_one(self):
+                    pass
+        """
+        )
+        testdir.runpytest_subprocess("-n", "2", "--relaxed-dist")
+        path = testdir.tmpdir.join(".pytest_cache/v/relaxed/durations")
+        durations = json.loads(path.read())
+        assert list(durations) == ["behaviors.py::Behaviors::behavior_one"]
+
+    def test_keeps_durations_of_deselected_tests(self, testdir):
+        testdir.makepyfile(
+            behaviors="""
+            class Behaviors:
+                def behavior_one(self):
+                    pass
+
+                def behavior_two(self):
+                    pass
+        """
+        )
+        testdir.runpytest_subprocess("--relaxed-order=fail-fast")
+        testdir.runpytest_subprocess(
+            "--relaxed-order=fail-fast", "-k", "behavior_one"
+        )
+        path = testdir.tmpdir.join(".pytest_cache/v/relaxed/durations")
+        assert sorted(json.loads(path.read())) == [
+            "behaviors.py::Behaviors::behavior_one",
+            "behaviors.py::Behaviors::behavior_two",
+        ]
+
+    def test_keeps_durations_of_tests_deselected_on_workers(self, testdir):
+        importorskip("xdist")
+        testdir.makepyfile(
+            foo="""
+            class Alpha:
+                def a_test(self):
+                    pass
+
+            class Beta:
+                def b_test(self):
+                    pass
+        """
+        )
+        testdir.runpytest_subprocess("-n", "2", "--relaxed-dist")
+        testdir.runpytest_subprocess(
+            "-n", "2", "--relaxed-dist", "-k", "a_test"
+        )
+        path = testdir.tmpdir.join(".pytest_cache/v/relaxed/durations")
+        assert sorted(json.loads(path.read())) == [
+            "foo.py::Alpha::a_test",
+            "foo.py::Beta::b_test",
+        ]
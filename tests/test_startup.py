@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+
+def _newly_imported(code):
+    # Modules imported by running ``code``, beyond those pytest itself needs.
+    script = "\n".join(
+        [
+            "import sys",
+            "import pytest",
+            "before = set(sys.modules)",
+            code,
+            "print('\\n'.join(sorted(set(sys.modules) - before)))",
+        ]
+    )
+    out = subprocess.check_output([sys.executable, "-c", script])
+    return set(out.decode().split())
+
+
+class TestStartup:
+    # NOTE: plugin import time is paid by every single pytest process, so
+    # anything only some runs need should stay out of it.
+    def test_loading_plugin_defers_optional_machinery(self):
+        imported = _newly_imported("import pytest_relaxed.plugin")
+        for name in (
+            "decorator",
+            "contextvars",
+            "pytest_relaxed.capture",
+            "pytest_relaxed.jsonl",
+            "pytest_relaxed.reporter",
+            "pytest_relaxed.scheduling",
+        ):
+            assert name not in imported
+
+    def test_helpers_do_not_import_decorator_until_used(self):
+        imported = _newly_imported("from pytest_relaxed import raises, trap")
+        assert "decorator" not in imported
+        assert "pytest_relaxed.capture" not in imported
+        imported = _newly_imported(
+            "from pytest_relaxed import raises; raises(KeyError)(print)"
+        )
+        assert "decorator" in imported
+
+    def test_trap_only_imports_capture_machinery_for_its_options(self):
+        imported = _newly_imported(
+            "from pytest_relaxed import trap; trap(lambda: None)()"
+        )
+        assert "pytest_relaxed.capture" not in imported
+        imported = _newly_imported(
+            "from pytest_relaxed import trap; trap(local=True)(lambda: None)()"
+        )
+        assert "pytest_relaxed.capture" in imported
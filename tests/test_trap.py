@@ -0,0 +1,405 @@
+import asyncio
+import contextvars
+import inspect
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from pytest_relaxed import trap
+from pytest_relaxed.capture import CaptureLog
+from pytest_relaxed.trap import CarbonCopy
+
+
+def _chatter():
+    sys.stdout.write("out 1\n")
+    sys.stderr.write("err 1\n")
+    sys.stdout.buffer.write("out 2 ☃\n".encode("utf-8"))
+
+
+class Test_trap:
+    def test_captures_streams_separately_and_together(self):
+        @trap
+        def run():
+            _chatter()
+            assert sys.stdout.getvalue() == "out 1\nout 2 ☃\n"
+            assert sys.stderr.getvalue() == "err 1\n"
+            assert sys.stdall.getvalue() == "out 1\nerr 1\nout 2 ☃\n"
+
+        run()
+
+    def test_restores_streams_afterwards(self):
+        stdout, stderr = sys.stdout, sys.stderr
+
+        @trap(chunked=True)
+        def run():
+            assert sys.stdout is not stdout
+            raise ValueError
+
+        with pytest.raises(ValueError):
+            run()
+        assert sys.stdout is stdout
+        assert sys.stderr is stderr
+        assert not hasattr(sys, "stdall")
+
+    def test_chunked_mode_offers_same_views(self):
+        @trap(chunked=True)
+        def run():
+            _chatter()
+            sys.stdall.write("all only\n")
+            assert sys.stdout.getvalue() == "out 1\nout 2 ☃\n"
+            assert sys.stderr.getvalue() == "err 1\n"
+            assert sys.stdall.getvalue() == (
+                "out 1\nerr 1\nout 2 ☃\nall only\n"
+            )
+
+        run()
+
+    def test_max_bytes_keeps_most_recent_output(self):
+        @trap(max_bytes=10)
+        def run():
+            for i in range(100):
+                print(i)
+            value = sys.stdout.getvalue()
+            assert value.endswith("97\n98\n99\n")
+            assert len(value) <= 10
+
+        run()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="fd capture is POSIX only")
+class Test_trap_fd:
+    def test_captures_descriptor_level_output(self):
+        @trap(fd=True)
+        def run():
+            os.write(1, b"fd out\n")
+            os.write(2, b"fd err\n")
+            assert sys.stdout.getvalue() == "fd out\n"
+            assert sys.stderr.getvalue() == "fd err\n"
+
+        run()
+
+    def test_captures_subprocess_output(self):
+        @trap(fd=True)
+        def run():
+            code = "import sys; print('child'); sys.stderr.write('oops')"
+            subprocess.check_call([sys.executable, "-c", code])
+            assert sys.stdout.getvalue() == "child\n"
+            assert sys.stderr.getvalue() == "oops"
+
+        run()
+
+    def test_python_and_descriptor_writes_stay_in_order(self):
+        @trap(fd=True)
+        def run():
+            for i in range(50):
+                sys.stdout.write("py{}\n".format(i))
+                os.write(2, "fd{}\n".format(i).encode())
+            expected = "".join("py{0}\nfd{0}\n".format(i) for i in range(50))
+            assert sys.stdall.getvalue() == expected
+
+        run()
+
+    def test_does_not_block_on_full_pipes(self):
+        @trap(fd=True)
+        def run():
+            data = b"x" * (1024 * 1024)
+            os.write(1, data)
+            assert len(sys.stdout.getvalue()) == len(data)
+
+        run()
+
+    def test_restores_descriptors(self):
+        before = os.fstat(1)
+
+        @trap(fd=True)
+        def run():
+            assert os.fstat(1).st_ino != before.st_ino
+
+        run()
+        assert os.fstat(1).st_ino == before.st_ino
+
+
+class Test_trap_async:
+    def test_awaits_coroutine_functions(self):
+        @trap
+        async def run():
+            await asyncio.sleep(0)
+            print("hi")
+            return sys.stdout.getvalue()
+
+        assert inspect.iscoroutinefunction(run)
+        assert asyncio.run(run()) == "hi\n"
+
+    def test_concurrent_tasks_capture_separately(self):
+        @trap(chunked=True)
+        async def task(name):
+            for i in range(3):
+                print("{} {}".format(name, i))
+                sys.stderr.write("{} err\n".format(name))
+                await asyncio.sleep(0)
+            return sys.stdout.getvalue(), sys.stdall.line_count
+
+        async def main():
+            return await asyncio.gather(task("a"), task("b"))
+
+        (a_out, a_count), (b_out, b_count) = asyncio.run(main())
+        assert a_out == "a 0\na 1\na 2\n"
+        assert b_out == "b 0\nb 1\nb 2\n"
+        assert a_count == b_count == 6
+
+    def test_restores_streams_once_all_tasks_finish(self):
+        stdout = sys.stdout
+
+        @trap
+        async def task():
+            await asyncio.sleep(0)
+
+        async def main():
+            await asyncio.gather(task(), task())
+
+        asyncio.run(main())
+        assert sys.stdout is stdout
+        assert not hasattr(sys, "stdall")
+
+    def test_untrapped_code_writes_through(self):
+        seen = []
+
+        @trap
+        async def trapped():
+            await asyncio.sleep(0.01)
+
+        async def untrapped():
+            sys.stdout.write("passthrough")
+            seen.append(sys.stdout._target())
+
+        async def main():
+            await asyncio.gather(trapped(), untrapped())
+
+        stdout = sys.stdout
+        asyncio.run(main())
+        assert seen == [stdout]
+
+    def test_fd_capture_is_not_supported(self):
+        with pytest.raises(ValueError):
+
+            @trap(fd=True)
+            async def run():
+                pass
+
+
+class Test_trap_local:
+    def test_threads_capture_separately(self):
+        barrier = threading.Barrier(2)
+        results = {}
+
+        @trap(local=True)
+        def work(name):
+            for i in range(3):
+                # Make sure both threads are writing at the same time.
+                barrier.wait()
+                print("{} {}".format(name, i))
+            results[name] = sys.stdout.getvalue()
+
+        threads = [
+            threading.Thread(target=work, args=(name,)) for name in "ab"
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == {
+            "a": "a 0\na 1\na 2\n",
+            "b": "b 0\nb 1\nb 2\n",
+        }
+
+    def test_helper_threads_need_the_trapped_context(self):
+        @trap(local=True)
+        def run():
+            context = contextvars.copy_context()
+            helper = threading.Thread(
+                target=context.run, args=(print, "from helper")
+            )
+            helper.start()
+            helper.join()
+            assert sys.stdout.getvalue() == "from helper\n"
+
+        run()
+
+    def test_restores_streams(self):
+        stdout = sys.stdout
+
+        @trap(local=True)
+        def run():
+            assert sys.stdout is not stdout
+
+        run()
+        assert sys.stdout is stdout
+        assert not hasattr(sys, "stdall")
+
+    def test_fd_capture_is_not_supported(self):
+        with pytest.raises(ValueError):
+            trap(fd=True, local=True)(lambda: None)
+
+
+class TestStreamingLines:
+    # Both capture implementations offer the same API.
+    @pytest.fixture(params=[False, True], ids=["carboncopy", "chunked"])
+    def chunked(self, request):
+        return request.param
+
+    def test_counts_lines_incrementally(self, chunked):
+        @trap(chunked=chunked)
+        def run():
+            sys.stdout.write("one\ntw")
+            sys.stdout.assert_line_count(1)
+            sys.stdout.write(b"o\nthree\n")
+            sys.stdout.assert_line_count(3)
+            sys.stderr.write("err\n")
+            assert sys.stdall.line_count == 4
+            with pytest.raises(AssertionError, match="Expected 5 lines"):
+                sys.stdall.assert_line_count(5)
+
+        run()
+
+    def test_callbacks_receive_decoded_lines(self, chunked):
+        seen = []
+
+        @trap(chunked=chunked)
+        def run():
+            sys.stdout.on_line(seen.append)
+            sys.stdout.write("sno")
+            sys.stdout.write("wman: ☃\nlast")
+
+        run()
+        # Trailing partial lines are published once capture ends.
+        assert seen == ["snowman: ☃", "last"]
+
+    def test_lines_iterates_while_output_is_written(self, chunked):
+        @trap(chunked=chunked)
+        def run():
+            def chatter():
+                for i in range(5):
+                    print("line {}".format(i))
+                    time.sleep(0.01)
+
+            thread = threading.Thread(target=chatter)
+            thread.start()
+            lines = list(islice_lines(sys.stdout, 5))
+            thread.join()
+            assert lines == ["line {}".format(i) for i in range(5)]
+            # Nothing more is coming, so a zero timeout stops right away.
+            assert list(sys.stdout.lines(timeout=0)) == lines
+
+        run()
+
+    def test_wait_for_returns_match_as_soon_as_it_appears(self, chunked):
+        @trap(chunked=chunked)
+        def run():
+            print("starting up")
+            timer = threading.Timer(0.05, lambda: print("ready on port 1234"))
+            timer.start()
+            match = sys.stdout.wait_for(r"port (\d+)", timeout=5)
+            assert match.group(1) == "1234"
+            # Already-written lines count too.
+            assert sys.stdout.wait_for("starting", timeout=0)
+            timer.join()
+
+        run()
+
+    def test_wait_for_fails_fast_on_timeout(self, chunked):
+        @trap(chunked=chunked)
+        def run():
+            print("nothing to see here")
+            start = time.monotonic()
+            with pytest.raises(AssertionError, match="Never saw"):
+                sys.stdout.wait_for("never", timeout=0.05)
+            assert time.monotonic() - start < 1
+
+        run()
+
+    @pytest.mark.skipif(os.name != "posix", reason="fd capture is POSIX only")
+    def test_works_with_descriptor_level_output(self):
+        @trap(fd=True)
+        def run():
+            code = "import time; print('booted', flush=True); time.sleep(5)"
+            proc = subprocess.Popen([sys.executable, "-c", code])
+            try:
+                sys.stdout.wait_for("booted", timeout=5)
+            finally:
+                proc.kill()
+                proc.wait()
+
+        run()
+
+
+class TestCarbonCopy:
+    def test_only_watches_writes_once_asked_to(self):
+        stream = CarbonCopy()
+        stream.write("one\n")
+        # Plain writes are untouched until the streaming API gets used.
+        assert "write" not in vars(stream)
+        stream.assert_line_count(1)
+        assert "write" in vars(stream)
+        stream.write("two\n")
+        stream.assert_line_count(2)
+
+    def test_catches_up_on_writes_racing_with_watching(self):
+        stream = CarbonCopy()
+        stream.assert_line_count(0)
+        # Stand-ins for writes already underway when watching started.
+        CarbonCopy.write(stream, "one\n")
+        stream.write("two\n")
+        stream.assert_line_count(2)
+        CarbonCopy.write(stream, "three\n")
+        stream.assert_line_count(3)
+        assert list(stream.lines(timeout=0)) == ["one", "two", "three"]
+
+
+def islice_lines(stream, count):
+    for i, line in enumerate(stream.lines(timeout=5)):
+        yield line
+        if i + 1 == count:
+            return
+
+
+class TestCaptureLog:
+    def test_writes_are_stored_once_without_copying(self):
+        log = CaptureLog()
+        data = b"x" * 1024
+        log.write("out", data)
+        assert log.chunks[0][1] is data
+
+    def test_ring_buffer_counts_dropped_output(self):
+        log = CaptureLog(max_bytes=5)
+        for word in ("abc", "def", "gh"):
+            log.write("out", word)
+        assert log.value() == "defgh"
+        assert log.dropped == 3
+
+    def test_spills_to_tempfile_past_threshold(self):
+        log = CaptureLog(spill_bytes=8)
+        for i in range(10):
+            log.write("out", "out{}\n".format(i))
+            log.write("err", b"err\n")
+        assert log.spill is not None
+        assert log.size <= 8
+        assert log.value(("err",)) == "err\n" * 10
+        assert log.value(("out",)) == "".join(
+            "out{}\n".format(i) for i in range(10)
+        )
+        log.close()
+        assert log.spill is None
+
+    def test_spilled_runs_from_one_stream_are_merged(self):
+        log = CaptureLog(spill_bytes=1)
+        for _ in range(5):
+            log.write("out", "ab")
+        assert log.spilled == [("out", 0, 10)]
+
+    def test_cannot_both_cap_and_spill(self):
+        with pytest.raises(ValueError):
+            CaptureLog(max_bytes=1, spill_bytes=1)